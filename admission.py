@@ -0,0 +1,140 @@
+import itertools
+import os
+import threading
+import time
+
+
+# Seconds of waiting that make a queued job count as one cost unit cheaper, so large jobs are not starved
+aging = 10.0
+
+
+def estimate_cost(cmd):
+    """
+    Rough cost of a zone.py run in units of a small standard mode job
+
+    Talkgroup mode costs most, it makes API calls for every selected repeater.
+    The number of repeaters grows with the number of MCCs or the radius.
+
+    Args:
+        cmd (list): zone.py command line
+
+    Returns:
+        float: Estimated cost
+    """
+    def value(option, default=None):
+        for number, token in enumerate(cmd):
+            if token == option and number + 1 < len(cmd):
+                return cmd[number + 1]
+            if token.startswith(option + '='):
+                return token.split('=', 1)[1]
+        return default
+
+    if value('-t') == 'mcc':
+        # Every comma separated value is a country, a range counts as one per MCC
+        area = 0
+        for token in value('-m', '').split(','):
+            start, _, end = token.partition('-')
+            # zone.py rejects a reversed range, it still counts as one MCC until then
+            area += max(1, int(end) - int(start) + 1) if start.isdigit() and end.isdigit() else 1
+        area *= 20
+    else:
+        area = max(1.0, (float(value('-r', 100)) / 100) ** 2)
+
+    if '-tg' in cmd:
+        return 5 * area
+
+    return 1 + area / 20
+
+
+class Ticket:
+    def __init__(self, number, session_id, cost):
+        self.number = number
+        self.session_id = session_id
+        self.cost = cost
+        self.queued_at = time.monotonic()
+        self.admitted = False
+
+
+class AdmissionController:
+    """
+    Limits how many generation jobs run at once on a shared host
+
+    Jobs wait in a queue ordered by estimated cost, so small jobs are admitted before
+    large ones, while waiting makes a job gradually cheaper. Every session may only have
+    a limited number of jobs running or waiting at the same time.
+    """
+
+    def __init__(self, max_jobs, max_jobs_per_session):
+        self.max_jobs = max_jobs
+        self.max_jobs_per_session = max_jobs_per_session
+        self.condition = threading.Condition()
+        self.numbers = itertools.count()
+        self.queue = []
+        self.running = []
+
+    def submit(self, session_id, cost):
+        """Queue a job, None if the session already has as many jobs as it may have"""
+        with self.condition:
+            jobs = sum(1 for ticket in self.queue + self.running if ticket.session_id == session_id)
+            if jobs >= self.max_jobs_per_session:
+                return None
+
+            ticket = Ticket(next(self.numbers), session_id, cost)
+            self.queue.append(ticket)
+            self.admit()
+
+            return ticket
+
+    def priority(self, ticket):
+        return ticket.cost - (time.monotonic() - ticket.queued_at) / aging, ticket.number
+
+    def admit(self):
+        """Start queued jobs in priority order while there are free slots, condition must be held"""
+        self.queue.sort(key=self.priority)
+
+        while self.queue and len(self.running) < self.max_jobs:
+            ticket = self.queue.pop(0)
+            ticket.admitted = True
+            self.running.append(ticket)
+
+        self.condition.notify_all()
+
+    def wait(self, ticket, timeout=None):
+        """Wait until the job may start, False if it is still queued after timeout seconds"""
+        with self.condition:
+            if not ticket.admitted:
+                self.admit()
+                self.condition.wait_for(lambda: ticket.admitted, timeout)
+
+            return ticket.admitted
+
+    def position(self, ticket):
+        """Place of a queued job in the queue starting with 1, 0 once it runs"""
+        with self.condition:
+            if ticket.admitted:
+                return 0
+
+            self.queue.sort(key=self.priority)
+            return self.queue.index(ticket) + 1 if ticket in self.queue else 0
+
+    def release(self, ticket):
+        """Finish a running job or withdraw a queued one"""
+        with self.condition:
+            if ticket in self.running:
+                self.running.remove(ticket)
+            elif ticket in self.queue:
+                self.queue.remove(ticket)
+
+            self.admit()
+
+    def status(self):
+        with self.condition:
+            return {'running': len(self.running), 'queued': len(self.queue), 'max_jobs': self.max_jobs}
+
+
+def from_environment():
+    """Controller with limits from $MOTOBM_MAX_JOBS and $MOTOBM_MAX_JOBS_PER_SESSION"""
+    max_jobs = int(os.environ.get('MOTOBM_MAX_JOBS', max(1, (os.cpu_count() or 2) // 2)))
+    max_jobs_per_session = int(os.environ.get('MOTOBM_MAX_JOBS_PER_SESSION', 1))
+
+    return AdmissionController(max_jobs, max_jobs_per_session)
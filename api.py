@@ -0,0 +1,445 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import uuid
+import zipfile
+from datetime import datetime
+from urllib.parse import quote, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import admission
+import contacts
+import jobs
+import metrics
+
+
+parser = argparse.ArgumentParser(description='JSON API generating zone files with zone.py for scripts and bulk '
+                                             'clients. Jobs share the admission queue limits of the web app, see '
+                                             'MOTOBM_MAX_JOBS and MOTOBM_MAX_JOBS_PER_SESSION.')
+parser.add_argument('--host', default=os.environ.get('MOTOBM_API_HOST', '127.0.0.1'),
+                    help='Address to listen on. Defaults to $MOTOBM_API_HOST or 127.0.0.1.')
+parser.add_argument('--port', type=int, default=int(os.environ.get('MOTOBM_API_PORT') or 8600),
+                    help='Port to listen on. Defaults to $MOTOBM_API_PORT or 8600.')
+
+# zone.py options a job may set by their long name, output, API and checkpoint options are set by the service
+job_options = {
+    'force': '-f', 'name': '-n', 'band': '-b', 'type': '-t', 'mcc': '-m', 'qth': '-q', 'radius': '-r',
+    'lat': '-lat', 'lon': '-lon', 'pep': '-p', 'six': '-6', 'zone_capacity': '-zc', 'customize': '-c',
+    'callsign': '-cs', 'max_age': '--max-age', 'talkgroups': '-tg', 'city_prefix': '--city-prefix',
+    'memprofile': '--memprofile', 'targets': '--targets', 'combine': '--combine', 'cluster': '--cluster',
+}
+# Options a precomputed Standard Mode pack can stand in for
+pack_options = {'name', 'band', 'type', 'mcc', 'six', 'pep', 'zone_capacity'}
+# Largest request body, an uploaded contact template included
+max_body = 5 * 2 ** 20
+
+
+def build_command(options, output_dir, contacts_file=None):
+    """
+    zone.py command line of a job
+
+    Args:
+        options (dict): zone.py options by long name, true for flags, false or null to leave one out
+        output_dir (str): Output directory of the job
+        contacts_file (str): Contact template for talkgroup mode
+
+    Returns:
+        list: Command line
+
+    Raises:
+        ValueError: If an option is unknown, set by the service or has no usable value
+    """
+    cmd = [sys.executable, 'zone.py', '-o', output_dir, '--format', 'json']
+
+    for name, value in options.items():
+        option = job_options.get(name.replace('-', '_'))
+        if option is None:
+            raise ValueError(f'Option "{name}" is unknown or cannot be set through the API')
+        if value is None or value is False:
+            continue
+        # Zone files are named after the zone, which must not lead out of the output directory
+        if option == '-n' and ('/' in str(value) or '\\' in str(value) or '..' in str(value)):
+            raise ValueError('Option "name" must not contain path separators or ".."')
+        if value is True:
+            cmd.append(option)
+        elif isinstance(value, (str, int, float)):
+            # Joined with = so negative coordinates are not taken for options
+            cmd.append(f'{option}={value}')
+        else:
+            raise ValueError(f'Option "{name}" must be a string, a number or a boolean')
+
+    if contacts_file:
+        cmd.append(f'--contacts={contacts_file}')
+
+    return cmd
+
+
+def find_pack(options):
+    """Precomputed pack for a Standard Mode job the web app would also serve from one, None otherwise"""
+    used = {name.replace('-', '_') for name, value in options.items() if value is not None and value is not False}
+    if not used <= pack_options or options.get('type') != 'mcc' or not options.get('name'):
+        return None
+
+    pep = options.get('pep')
+    try:
+        power = None if pep is None or pep is False else 0 if pep is True else int(pep)
+        zone_capacity = int(options.get('zone_capacity', options.get('zone-capacity', 160)))
+    except ValueError:
+        return None
+
+    return jobs.find_standard_pack(str(options.get('mcc', '')), options.get('band'), bool(options.get('six')),
+                                   power, zone_capacity)
+
+
+def remove_file(file_name):
+    if file_name:
+        try:
+            os.remove(file_name)
+        except OSError:
+            pass
+
+
+class Job:
+    def __init__(self, job_id, client_id, cmd, output_dir):
+        self.id = job_id
+        self.client_id = client_id
+        self.cmd = cmd
+        self.output_dir = output_dir
+        self.mode = jobs.job_mode(cmd)
+        self.created = datetime.now().isoformat(timespec='seconds')
+        self.ticket = None
+        self.pack = None
+        self.zone_name = None
+        self.contacts_file = None
+        self.returncode = None
+        self.output = ''
+        self.error = ''
+        self.finished = None
+
+    @property
+    def status(self):
+        if self.finished is not None:
+            return 'done' if self.returncode == 0 else 'failed'
+        if self.ticket is not None and not self.ticket.admitted:
+            return 'queued'
+        return 'running'
+
+    def path(self, name):
+        """Path of a file of the job, None if the name leads out of its output directory"""
+        output_dir = os.path.realpath(self.output_dir)
+        path = os.path.realpath(os.path.join(output_dir, name))
+        if path == output_dir or os.path.commonpath([output_dir, path]) != output_dir:
+            return None
+        return path
+
+    def files(self):
+        """Files written by the job, as listed in its run summary"""
+        run_summary = jobs.load_run_summary(self.output_dir)
+        if run_summary is not None:
+            names = run_summary['files']
+        elif os.path.isdir(self.output_dir):
+            names = sorted(os.listdir(self.output_dir))
+        else:
+            return []
+        return [name for name in names if self.path(name) is not None and os.path.isfile(self.path(name))]
+
+    def to_json(self, controller):
+        data = {
+            'id': self.id,
+            'status': self.status,
+            'mode': self.mode,
+            'created': self.created,
+            'finished': self.finished,
+            'links': {'self': f'/jobs/{self.id}'},
+        }
+
+        if data['status'] == 'queued':
+            data['position'] = controller.position(self.ticket)
+            data['queue'] = controller.status()
+        elif data['status'] == 'done':
+            data['summary'] = jobs.load_run_summary(self.output_dir)
+            data['files'] = self.files()
+            data['links']['archive'] = f'/jobs/{self.id}/archive'
+            data['links']['files'] = {name: f'/jobs/{self.id}/files/{quote(name)}' for name in data['files']}
+        elif data['status'] == 'failed':
+            data['error'] = self.error.strip() or self.output.strip()
+
+        return data
+
+
+class JobService:
+    """
+    Generation jobs submitted through the API
+
+    Jobs run in background threads through jobs.run_generator, the same engine as the web
+    app, so they wait in the same admission queue, are counted in the same metrics and share
+    BM.json, the API cache and the precomputed packs. Job state is kept in memory, files are
+    written to output_api_<id> next to the app's output directories.
+    """
+
+    def __init__(self, controller, app_metrics):
+        self.controller = controller
+        self.app_metrics = app_metrics
+        self.lock = threading.Lock()
+        self.jobs = {}
+
+    def submit(self, client_id, request):
+        """
+        Start a job for a request body
+
+        Args:
+            client_id (str): Client the job counts against in the admission queue
+            request (dict): {"options": {...}, "contacts": "CSV contact template"}
+
+        Returns:
+            tuple: Job, None if the client already has as many jobs as it may have, and the
+                problems found in the contact template
+
+        Raises:
+            ValueError: If the request cannot be run
+        """
+        options = request.get('options')
+        if not isinstance(options, dict):
+            raise ValueError('"options" must be an object of zone.py options')
+
+        job_id = uuid.uuid4().hex
+        output_dir = f'output_api_{job_id}'
+        contacts_file = None
+        template_file = None
+        problems = []
+
+        if request.get('contacts') is not None:
+            if not isinstance(request['contacts'], str):
+                raise ValueError('"contacts" must be the CSV text of a contact template')
+            template = contacts.ingest(request['contacts'], 'Contact template')
+            problems = template.problems
+            # Kept outside contact_uploads_*, which zone.py runs without --contacts clear
+            os.makedirs('contact_templates', exist_ok=True)
+            contacts_file = template_file = os.path.join('contact_templates', f'api_{job_id}.json')
+            contacts.store(template, contacts_file)
+        elif options.get('talkgroups') and os.path.exists('contact_template.csv'):
+            contacts_file = 'contact_template.csv'
+
+        try:
+            job = Job(job_id, client_id, build_command(options, output_dir, contacts_file), output_dir)
+        except ValueError:
+            remove_file(template_file)
+            raise
+        job.contacts_file = template_file
+
+        job.pack = None if job.mode == 'talkgroup' else find_pack(options)
+        if job.pack:
+            job.zone_name = str(options['name'])
+        else:
+            job.ticket = self.controller.submit(f'api_{client_id}', admission.estimate_cost(job.cmd))
+            if job.ticket is None:
+                self.app_metrics.record_job(job.mode, 'rejected')
+                remove_file(template_file)
+                return None, problems
+
+        with self.lock:
+            self.jobs[job_id] = job
+        threading.Thread(target=self.run, args=(job,), daemon=True).start()
+
+        return job, problems
+
+    def run(self, job):
+        try:
+            if job.pack:
+                result = jobs.serve_pack(job.pack, job.zone_name, job.output_dir, self.app_metrics)
+            else:
+                result = jobs.run_generator(job.cmd, self.controller, self.app_metrics, f'api_{job.client_id}',
+                                            ticket=job.ticket)
+            job.returncode, job.output, job.error = result
+        except Exception as e:
+            job.returncode, job.error = 1, str(e)
+        finally:
+            remove_file(job.contacts_file)
+            job.finished = datetime.now().isoformat(timespec='seconds')
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def remove(self, job_id):
+        """Forget a finished job and delete its files"""
+        with self.lock:
+            job = self.jobs.pop(job_id)
+        shutil.rmtree(job.output_dir, ignore_errors=True)
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        self.send_json(status, {'error': message})
+
+    def route(self):
+        """Path split into parts and the job it names, None if there is no such job"""
+        parts = [unquote(part) for part in self.path.split('?')[0].split('/') if part]
+        job = self.server.service.get(parts[1]) if len(parts) > 1 and parts[0] == 'jobs' else None
+        return parts, job
+
+    def do_GET(self):
+        service = self.server.service
+        parts, job = self.route()
+
+        if parts in ([], ['status']):
+            self.send_json(200, {'queue': service.controller.status()})
+        elif len(parts) < 2 or parts[0] != 'jobs' or len(parts) > 4:
+            self.send_error_json(404, 'Not found')
+        elif job is None:
+            self.send_error_json(404, f'No job {parts[1]}')
+        elif len(parts) == 2:
+            self.send_json(200, job.to_json(service.controller))
+        elif job.status != 'done':
+            self.send_error_json(409, f'Job {job.id} is {job.status}')
+        elif parts[2:] == ['archive']:
+            self.send_archive(job)
+        elif len(parts) == 4 and parts[2] == 'files':
+            self.send_file(job, parts[3])
+        else:
+            self.send_error_json(404, 'Not found')
+
+    def do_POST(self):
+        if self.path.split('?')[0].rstrip('/') != '/jobs':
+            self.send_error_json(404, 'Not found')
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > max_body:
+            self.send_error_json(413, f'Request body is larger than {max_body} bytes')
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError('The request body must be a JSON object')
+            job, problems = self.server.service.submit(self.headers.get('X-Client-Id') or self.client_address[0],
+                                                       request)
+        except ValueError as e:
+            # Invalid JSON, options and contact templates (contacts.TemplateError)
+            self.send_error_json(400, str(e))
+            return
+
+        if job is None:
+            self.send_error_json(429, 'This client already has as many jobs running or queued as it may have, '
+                                      'wait until one finishes.')
+            return
+
+        data = job.to_json(self.server.service.controller)
+        if problems:
+            data['contact_problems'] = problems
+        self.send_json(202, data)
+
+    def do_DELETE(self):
+        parts, job = self.route()
+
+        if len(parts) != 2 or job is None:
+            self.send_error_json(404, 'Not found')
+        elif job.finished is None:
+            self.send_error_json(409, f'Job {job.id} is {job.status}')
+        else:
+            self.server.service.remove(job.id)
+            self.send_response(204)
+            self.end_headers()
+
+    def send_archive(self, job):
+        files = job.files()
+        if not files:
+            self.send_error_json(410, f'The files of job {job.id} were removed')
+            return
+
+        # No Content-Length, the archive is compressed while it is sent and the connection closes after it
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/zip')
+        self.send_header('Content-Disposition', f'attachment; filename="mototrbo_files_{job.id[:8]}.zip"')
+        self.end_headers()
+
+        # ZipFile writes straight to the socket, reading every file in chunks, as the stream cannot seek
+        with zipfile.ZipFile(self.wfile, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for name in files:
+                zip_file.write(job.path(name), name)
+
+    def send_file(self, job, name):
+        if name not in job.files():
+            self.send_error_json(404, f'Job {job.id} has no file {name}')
+            return
+
+        file_name = job.path(name)
+        with open(file_name, 'rb') as file:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json' if name.endswith('.json') else
+                             'text/csv' if name.endswith('.csv') else 'application/xml')
+            self.send_header('Content-Length', str(os.fstat(file.fileno()).st_size))
+            self.send_header('Content-Disposition', f'attachment; filename="{name}"')
+            self.end_headers()
+            shutil.copyfileobj(file, self.wfile)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(service, host='127.0.0.1', port=8600):
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    server.service = service
+
+    return server
+
+
+def start_server(service, host='127.0.0.1', port=8600):
+    """
+    Serve the API on http://host:port from a daemon thread
+
+    Returns:
+        ThreadingHTTPServer: Running server, port 0 picks a free port, see server.server_address
+    """
+    server = make_server(service, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def from_environment(controller, app_metrics):
+    """
+    API for the web app process on $MOTOBM_API_HOST:$MOTOBM_API_PORT
+
+    Jobs share the controller and metrics of the app. The API is off unless MOTOBM_API_PORT is set.
+
+    Returns:
+        JobService: Service of the running API, None if it is off or the port is taken
+    """
+    port = os.environ.get('MOTOBM_API_PORT', '')
+    if not port:
+        return None
+
+    service = JobService(controller, app_metrics)
+    try:
+        start_server(service, os.environ.get('MOTOBM_API_HOST', '127.0.0.1'), int(port))
+    except OSError as e:
+        # Another app process already serves the port
+        print(f'API not started: {e}')
+        return None
+
+    return service
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    controller = admission.from_environment()
+    server = make_server(JobService(controller, metrics.from_environment(controller)), args.host, args.port)
+    print(f'Serving the zone generator API on http://{args.host}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
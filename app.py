@@ -6,8 +6,18 @@ from io import StringIO
 import base64
 import uuid
 import hashlib
+import json
+import threading
 from datetime import datetime
 
+import admission
+import api
+import contacts
+import jobs
+import metrics
+from jobs import find_standard_pack, load_run_summary
+from zone import memory_start, memory_stop
+
 st.set_page_config(page_title="MOTOTRBO Zone Generator", page_icon="📻", layout="wide")
 
 # Function to generate a unique session ID for each user
@@ -23,12 +33,141 @@ def get_session_id():
     
     return st.session_state.session_id
 
+# Show found repeaters and errors of a run as tables instead of the generator's text output
+def show_run_summary(run_summary, output):
+    st.markdown(f"Found **{run_summary['repeaters']}** repeaters, wrote **{len(run_summary['zones'])}** zones")
+    for error in run_summary["errors"]:
+        st.warning(error)
+    if run_summary["channels"]:
+        st.dataframe(pd.DataFrame(run_summary["channels"]), height=300)
+    with st.expander("Generator output"):
+        st.code(output)
+
+# List the XML files written by a run, falling back to the directory contents without a summary
+def list_xml_files(output_dir, run_summary):
+    if run_summary is not None:
+        return [f for f in run_summary["files"] if f.endswith('.xml')]
+    return [f for f in os.listdir(output_dir) if f.endswith('.xml')]
+
 # Get or create a unique session ID for the current user
 session_id = get_session_id()
 
+# One admission controller shared by all sessions, limits come from MOTOBM_MAX_JOBS and MOTOBM_MAX_JOBS_PER_SESSION
+@st.cache_resource
+def get_admission_controller():
+    return admission.from_environment()
+
+# Metrics of all sessions served in the Prometheus text format, see MOTOBM_METRICS_PORT
+@st.cache_resource
+def get_metrics():
+    return metrics.from_environment(get_admission_controller())
+
+# Start the metrics endpoint with the first page load instead of the first job
+get_metrics()
+
+# JSON API for scripts on $MOTOBM_API_PORT, its jobs share the admission queue and metrics of the app
+@st.cache_resource
+def get_api():
+    return api.from_environment(get_admission_controller(), get_metrics())
+
+get_api()
+
+# Run zone.py once the admission controller lets the job start, showing the queue position meanwhile
+def run_generator(cmd):
+    queue_info = st.empty()
+    def show_position(position, status):
+        if position == 0:
+            queue_info.empty()
+        else:
+            queue_info.info(f"Waiting for a free slot: position {position} of {status['queued']} "
+                            f"in queue, {status['running']} jobs running")
+    return jobs.run_generator(cmd, get_admission_controller(), get_metrics(), session_id, show_position)
+
+# Write a precomputed pack into the output directory under the requested zone name, as if zone.py had run
+def serve_pack(pack, zone_name, output_dir):
+    return jobs.serve_pack(pack, zone_name, output_dir, get_metrics())
+
+# Dry run of zone.py for a command line, cached briefly as Streamlit reruns the page on every input change
+@st.cache_data(ttl=60, show_spinner=False)
+def estimate_job(cmd):
+    try:
+        process = subprocess.run(list(cmd) + ["--dry-run"], capture_output=True, text=True, timeout=30)
+    except subprocess.TimeoutExpired:
+        return None
+    if process.returncode != 0 or not process.stdout.strip():
+        return None
+    try:
+        return json.loads(process.stdout.strip().splitlines()[-1])
+    except ValueError:
+        return None
+
+# Show how many repeaters, zones and API calls a job means and how long it will take
+def show_estimate(cmd):
+    estimate = estimate_job(tuple(cmd))
+    if estimate is None:
+        return
+    message = (f"This selection matches **{estimate['repeaters']}** repeaters: about {estimate['zones']} zones with "
+               f"{estimate['channels']} channels, {estimate['api_calls']} BrandMeister API calls, "
+               f"roughly {estimate['seconds']:g} seconds")
+    if estimate["seconds"] > 120:
+        st.warning(message + ". Consider narrowing the selection.")
+    else:
+        st.info(message)
+
+# tracemalloc traces the whole server process, so only one session profiles at a time
+@st.cache_resource
+def get_profile_lock():
+    return threading.Lock()
+
+# Trace the app's own allocations while it packages the files of a job, zone.py profiles itself with --memprofile.
+# Skipped while another session profiles or something else already traces the process.
+def start_app_profile():
+    if not memory_profile:
+        return None
+    import tracemalloc
+    lock = get_profile_lock()
+    if not lock.acquire(blocking=False):
+        return None
+    if tracemalloc.is_tracing():
+        lock.release()
+        return None
+    tracemalloc.start()
+    return lock, memory_start("app packaging")
+
+def stop_app_profile(profile):
+    if profile is None:
+        return None
+    import tracemalloc
+    lock, marker = profile
+    try:
+        return memory_stop(marker)
+    finally:
+        tracemalloc.stop()
+        lock.release()
+
+# Show the memory profile of the zone.py stages and of the app packaging the downloads
+def show_memory_profile(run_summary, app_stage):
+    stages = list((run_summary or {}).get("memory", {}).get("stages", []))
+    if app_stage is not None:
+        stages.append(app_stage)
+    if not stages:
+        return
+    with st.expander("Memory profile", expanded=True):
+        st.dataframe(pd.DataFrame([{"Stage": stage["stage"],
+                                    "Peak MiB": round(stage["peak_bytes"] / 2 ** 20, 1),
+                                    "Retained MiB": round(stage["retained_bytes"] / 2 ** 20, 1),
+                                    "Seconds": stage["seconds"]} for stage in stages]))
+        for stage in stages:
+            if stage["top"]:
+                st.markdown(f"Allocation sites growing most in **{stage['stage']}**")
+                st.dataframe(pd.DataFrame(stage["top"]))
+
 st.title("MOTOTRBO Zone Generator")
 st.markdown("Generate MOTOTRBO zone files from BrandMeister repeater list")
 
+memory_profile = st.sidebar.checkbox("Memory profile", help="Report peak and retained memory of each generation "
+                                     "stage and of packaging the downloads, with the allocation sites growing most")
+
 # Create tabs for different modes
 tab1, tab2 = st.tabs(["Standard Mode", "Talkgroup Mode"])
 
@@ -39,7 +178,9 @@ with tab1:
     
     with col1:
         zone_name = st.text_input("Zone Name", help="Choose a name for your zone")
-        band = st.selectbox("Band", ["vhf", "uhf"], help="Select repeater band")
+        band = st.selectbox("Band", ["vhf", "uhf", "2m", "1.25m", "70cm"],
+                            help="Select repeater band: vhf 136-174 MHz, uhf 400-480 MHz, 2m 144-148 MHz, "
+                                 "1.25m 222-225 MHz, 70cm 420-450 MHz")
         
         search_type = st.selectbox("Search Type", ["mcc", "qth", "gps"], 
                                   help="Select repeaters by MCC code, QTH locator index or GPS coordinates")
@@ -101,141 +242,170 @@ with tab1:
         zone_capacity = st.number_input("Zone Capacity", min_value=1, value=160, 
                                        help="Channel capacity within zone. 160 by default for top models, use 16 for lite models")
         
+        cluster = st.checkbox("Group Zones by Location",
+                              help="Split large selections into geographically compact zones named after their city "
+                                   "instead of filling zones in callsign order")
+        
         customize = st.checkbox("Include Custom Values", 
                                help="Include customized values for each channel")
         
         callsign_filter = st.text_input("Callsign Filter", 
                                        help="Only list callsigns containing specified string like a region number")
     
+    # Check the inputs first, the estimate and the generator need a complete selection
+    if search_type == "mcc" and not mcc:
+        selection_error = "Please enter an MCC code or country code"
+    elif search_type == "qth" and not qth:
+        selection_error = "Please enter a QTH locator"
+    elif search_type == "gps" and (latitude == 0 and longitude == 0):
+        selection_error = "Please enter valid GPS coordinates"
+    elif not zone_name:
+        selection_error = "Please enter a zone name"
+    else:
+        selection_error = None
+    
+    # Build command with user-specific output directory
+    user_output_dir = f"output_{session_id}"
+    cmd = ["python", "zone.py", "-n", zone_name, "-b", band, "-t", search_type, "-o", user_output_dir,
+           "--format", "json"]
+    
+    if force_download:
+        cmd.extend(["-f"])
+    
+    if search_type == "mcc":
+        cmd.extend(["-m", mcc])
+    elif search_type == "qth":
+        # Always pass radius in km to the backend as an integer
+        cmd.extend(["-q", qth, "-r", str(int(radius))])
+    elif search_type == "gps":
+        # Handle negative coordinates using the format from README example
+        if latitude < 0:
+            cmd.extend([f"-lat=-{abs(latitude)}"])
+        else:
+            cmd.extend(["-lat", str(latitude)])
+        
+        # Use the -lon=VALUE format for negative longitude values
+        if longitude < 0:
+            cmd.extend([f"-lon=-{abs(longitude)}"])
+        else:
+            cmd.extend(["-lon", str(longitude)])
+        
+        # Always pass radius in km to the backend as an integer
+        cmd.extend(["-r", str(int(radius))])
+    
+    if only_with_power:
+        cmd.extend(["-p", str(min_power)])
+    
+    if six_digit:
+        cmd.extend(["-6"])
+    
+    cmd.extend(["-zc", str(zone_capacity)])
+    
+    if cluster:
+        cmd.extend(["--cluster"])
+    
+    if customize:
+        cmd.extend(["-c"])
+    
+    if callsign_filter:
+        cmd.extend(["-cs", callsign_filter])
+    
+    if memory_profile:
+        cmd.extend(["--memprofile"])
+    
+    # Show what the job will cost while the filters are changed
+    if selection_error is None:
+        show_estimate(cmd)
+    
     if st.button("Generate Zone Files", key="generate_standard"):
-        if search_type == "mcc" and not mcc:
-            st.error("Please enter an MCC code or country code")
-        elif search_type == "qth" and not qth:
-            st.error("Please enter a QTH locator")
-        elif search_type == "gps" and (latitude == 0 and longitude == 0):
-            st.error("Please enter valid GPS coordinates")
-        elif not zone_name:
-            st.error("Please enter a zone name")
+        if selection_error:
+            st.error(selection_error)
         else:
-            # Build command with user-specific output directory
-            user_output_dir = f"output_{session_id}"
-            cmd = ["python", "zone.py", "-n", zone_name, "-b", band, "-t", search_type, "-o", user_output_dir]
-            
-            if force_download:
-                cmd.extend(["-f"])
-            
-            if search_type == "mcc":
-                cmd.extend(["-m", mcc])
-            elif search_type == "qth":
-                # Always pass radius in km to the backend as an integer
-                cmd.extend(["-q", qth, "-r", str(int(radius))])
-            elif search_type == "gps":
-                # Handle negative coordinates using the format from README example
-                if latitude < 0:
-                    cmd.extend([f"-lat=-{abs(latitude)}"])
-                else:
-                    cmd.extend(["-lat", str(latitude)])
-                
-                # Use the -lon=VALUE format for negative longitude values
-                if longitude < 0:
-                    cmd.extend([f"-lon=-{abs(longitude)}"])
-                else:
-                    cmd.extend(["-lon", str(longitude)])
-                
-                # Always pass radius in km to the backend as an integer
-                cmd.extend(["-r", str(int(radius))])
-            
-            if only_with_power:
-                cmd.extend(["-p", str(min_power)])
-            
-            if six_digit:
-                cmd.extend(["-6"])
-            
-            cmd.extend(["-zc", str(zone_capacity)])
-            
-            if customize:
-                cmd.extend(["-c"])
-            
-            if callsign_filter:
-                cmd.extend(["-cs", callsign_filter])
-            
             # Show command
             cmd_str = " ".join(cmd)
             st.code(cmd_str, language="bash")
             
+            # Whole countries with default options come from the nightly packs without running zone.py
+            pack = None
+            if search_type == "mcc" and not force_download and not customize and not callsign_filter and not cluster:
+                pack = find_standard_pack(mcc, band, six_digit, min_power if only_with_power else None,
+                                          zone_capacity)
+            
             # Run command
             with st.spinner("Generating zone files..."):
-                process = subprocess.Popen(
-                    cmd, 
-                    stdout=subprocess.PIPE, 
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-                output, error = process.communicate()
+                if pack:
+                    returncode, output, error = serve_pack(pack, zone_name, user_output_dir)
+                else:
+                    returncode, output, error = run_generator(cmd)
                 
-                if process.returncode == 0:
+                if returncode == 0:
                     st.success("Zone files generated successfully!")
-                    st.code(output)
                     
                     # Find generated XML files in user-specific output directory
                     output_dir = f"output_{session_id}"
                     if not os.path.exists(output_dir):
                         os.makedirs(output_dir)
-                    xml_files = [f for f in os.listdir(output_dir) if f.endswith('.xml')]
-                    
-                    if xml_files:
-                        st.subheader("Download Generated Files")
+                    run_summary = load_run_summary(output_dir)
+                    if run_summary is not None:
+                        show_run_summary(run_summary, output)
+                    else:
+                        st.code(output)
+                    xml_files = list_xml_files(output_dir, run_summary)
+                    profile = start_app_profile()
+                    try:
+                        if xml_files:
+                            st.subheader("Download Generated Files")
                         
-                        # Create a zip file with all generated files
-                        import io
-                        import zipfile
+                            # Create a zip file with all generated files
+                            import io
+                            import zipfile
                         
-                        # Create a download button for all files in a zip
-                        if xml_files:
-                            zip_buffer = io.BytesIO()
-                            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                                # Add all XML files
-                                for xml_file in xml_files:
-                                    file_path = os.path.join(output_dir, xml_file)
-                                    with open(file_path, "r") as file:
-                                        zip_file.writestr(xml_file, file.read())
+                            # Create a download button for all files in a zip
+                            if xml_files:
+                                zip_buffer = io.BytesIO()
+                                with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                                    # Add all XML files
+                                    for xml_file in xml_files:
+                                        file_path = os.path.join(output_dir, xml_file)
+                                        with open(file_path, "r") as file:
+                                            zip_file.writestr(xml_file, file.read())
                             
-                            # Create download button for the zip file
-                            zip_buffer.seek(0)
-                            zip_bytes = zip_buffer.getvalue()
-                            zip_filename = f"mototrbo_files_{session_id[:8]}.zip"
-                            st.download_button(
-                                label="📦 Download All Files as ZIP",
-                                data=zip_bytes,
-                                file_name=zip_filename,
-                                mime="application/zip",
-                                key="download_standard_zip"
-                            )
+                                # Create download button for the zip file
+                                zip_buffer.seek(0)
+                                zip_bytes = zip_buffer.getvalue()
+                                zip_filename = f"mototrbo_files_{session_id[:8]}.zip"
+                                st.download_button(
+                                    label="📦 Download All Files as ZIP",
+                                    data=zip_bytes,
+                                    file_name=zip_filename,
+                                    mime="application/zip",
+                                    key="download_standard_zip"
+                                )
                             
-                            # Horizontal line to separate individual file downloads
-                            st.markdown("---")
-                            st.markdown("Or download individual files:")
+                                # Horizontal line to separate individual file downloads
+                                st.markdown("---")
+                                st.markdown("Or download individual files:")
                         
-                        # Individual file downloads
-                        for xml_file in xml_files:
-                            file_path = os.path.join(output_dir, xml_file)
-                            with open(file_path, "r") as file:
-                                file_content = file.read()
+                            # Individual file downloads
+                            for xml_file in xml_files:
+                                file_path = os.path.join(output_dir, xml_file)
+                                with open(file_path, "r") as file:
+                                    file_content = file.read()
                                 
-                            b64 = base64.b64encode(file_content.encode()).decode()
-                            href = f'<a href="data:application/octet-stream;base64,{b64}" download="{xml_file}">Download {xml_file}</a>'
-                            st.markdown(href, unsafe_allow_html=True)
+                                b64 = base64.b64encode(file_content.encode()).decode()
+                                href = f'<a href="data:application/octet-stream;base64,{b64}" download="{xml_file}">Download {xml_file}</a>'
+                                st.markdown(href, unsafe_allow_html=True)
+                    finally:
+                        app_stage = stop_app_profile(profile)
+                    show_memory_profile(run_summary, app_stage)
                     
-                    # Clean up user-specific contact_uploads directory
-                    user_uploads_dir = f"contact_uploads_{session_id}"
-                    if os.path.exists(user_uploads_dir):
-                        for file in os.listdir(user_uploads_dir):
-                            file_path = os.path.join(user_uploads_dir, file)
-                            try:
-                                if os.path.isfile(file_path):
-                                    os.unlink(file_path)
-                            except Exception as e:
-                                st.warning(f"Error deleting {file_path}: {e}")
+                    # Remove the contact template index of this session, an upload is indexed again for the next job
+                    template_path = os.path.join("contact_templates", f"{session_id}.json")
+                    if os.path.exists(template_path):
+                        try:
+                            os.unlink(template_path)
+                        except OSError as e:
+                            st.warning(f"Error deleting {template_path}: {e}")
                 else:
                     st.error("Error generating zone files")
                     st.code(error)
@@ -261,38 +431,35 @@ with tab2:
     st.subheader("Upload Custom Contact Template")
     st.markdown(f"Download and modify the {template_href} file if you want talkgroups named differently than Brandmeister", unsafe_allow_html=True)
     uploaded_file = st.file_uploader("Upload your own contact_template.csv", type="csv", key="tg_template_upload")
+    # Template the job uses, the uploaded one indexed or the default one
+    contacts_template = "contact_template.csv" if os.path.exists("contact_template.csv") else None
     if uploaded_file is not None:
-        # Create user-specific contact_uploads directory
-        user_uploads_dir = f"contact_uploads_{session_id}"
-        if not os.path.exists(user_uploads_dir):
-            os.makedirs(user_uploads_dir)
+        # Indexes are kept outside contact_uploads_*, which zone.py runs without --contacts clear
+        os.makedirs("contact_templates", exist_ok=True)
+        template_path = os.path.join("contact_templates", f"{session_id}.json")
         
-        # Save the uploaded file to user-specific directory
-        template_path = os.path.join(user_uploads_dir, "contact_template.csv")
-        with open(template_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-            
-        # Also create a symlink in the contact_uploads directory for backward compatibility
-        if not os.path.exists("contact_uploads"):
-            os.makedirs("contact_uploads")
-        try:
-            # Remove any existing file first
-            contact_uploads_path = os.path.join("contact_uploads", "contact_template.csv")
-            if os.path.exists(contact_uploads_path):
-                os.remove(contact_uploads_path)
-            # Copy the file instead of creating a symlink (more compatible)
-            import shutil
-            shutil.copy2(template_path, contact_uploads_path)
-        except Exception as e:
-            st.warning(f"Could not create backup of template: {e}")
-        st.success("Custom contact template uploaded successfully!")
+        # Validate and index an upload once, the page reruns on every input change
+        if st.session_state.get("contact_upload_id") != uploaded_file.file_id or not os.path.exists(template_path):
+            try:
+                st.session_state.contact_template = contacts.ingest(uploaded_file.getvalue(), uploaded_file.name)
+                contacts.store(st.session_state.contact_template, template_path)
+                st.session_state.contact_upload_id = uploaded_file.file_id
+            except contacts.TemplateError as e:
+                st.session_state.contact_template = None
+                st.session_state.contact_upload_id = None
+                st.error(f"{e}. The default contact template is used.")
         
-        # Display the uploaded file as a dataframe
-        try:
-            df = pd.read_csv(uploaded_file)
-            st.dataframe(df, height=200)
-        except:
-            st.warning("Could not display the uploaded file as a table")
+        template = st.session_state.get("contact_template")
+        if template is not None:
+            contacts_template = template_path
+            st.success(f"Custom contact template uploaded successfully! {len(template.names)} talkgroup contacts.")
+            for problem in template.problems[:10]:
+                st.warning(problem)
+            if len(template.problems) > 10:
+                st.warning(f"{len(template.problems) - 10} more problems in the template")
+            
+            # Preview of the index the generator uses
+            st.dataframe(pd.DataFrame(template.index()), height=200)
     
     st.subheader("Channel Naming")
     use_city_prefix = st.checkbox("Use city abbreviation prefix for channel names", 
@@ -302,7 +469,9 @@ with tab2:
     col1, col2 = st.columns(2)
     
     with col1:
-        band_tg = st.selectbox("Band", ["vhf", "uhf"], help="Select repeater band", key="band_tg")
+        band_tg = st.selectbox("Band", ["vhf", "uhf", "2m", "1.25m", "70cm"],
+                               help="Select repeater band: vhf 136-174 MHz, uhf 400-480 MHz, 2m 144-148 MHz, "
+                                    "1.25m 222-225 MHz, 70cm 420-450 MHz", key="band_tg")
         
         search_type_tg = st.selectbox("Search Type", ["mcc", "qth", "gps"], 
                                      help="Select repeaters by MCC code, QTH locator index or GPS coordinates",
@@ -373,159 +542,187 @@ with tab2:
         callsign_filter_tg = st.text_input("Callsign Filter", 
                                           help="Only list callsigns containing specified string like a region number",
                                           key="callsign_filter_tg")
+        
+        combine_tg = st.checkbox("Combine Zones", value=True,
+                                help="Write all zones into one XML file so they can be pasted into CPS2 at once",
+                                key="combine_tg")
+        
+        if combine_tg:
+            combine_files_tg = st.number_input("Number of Files", min_value=1, value=1,
+                                              help="Split the combined zones into this many XML files",
+                                              key="combine_files_tg")
+    
+    # Check the inputs first, the estimate and the generator need a complete selection
+    if search_type_tg == "mcc" and not mcc_tg:
+        selection_error = "Please enter an MCC code or country code"
+    elif search_type_tg == "qth" and not qth_tg:
+        selection_error = "Please enter a QTH locator"
+    elif search_type_tg == "gps" and (latitude_tg == 0 and longitude_tg == 0):
+        selection_error = "Please enter valid GPS coordinates"
+    else:
+        selection_error = None
+    
+    # Build command with user-specific output directory
+    user_output_dir = f"output_{session_id}"
+    cmd = ["python", "zone.py", "-b", band_tg, "-t", search_type_tg, "-tg", "-o", user_output_dir,
+           "--format", "json"]
+    
+    if contacts_template:
+        cmd.extend(["--contacts", contacts_template])
+    
+    # Add city prefix option if selected
+    if use_city_prefix:
+        cmd.extend(["--city-prefix"])
+    
+    if force_download_tg:
+        cmd.extend(["-f"])
+    
+    if search_type_tg == "mcc":
+        cmd.extend(["-m", mcc_tg])
+    elif search_type_tg == "qth":
+        # Always pass radius in km to the backend as an integer
+        cmd.extend(["-q", qth_tg, "-r", str(int(radius_tg))])
+    elif search_type_tg == "gps":
+        # Handle negative coordinates using the format from README example
+        if latitude_tg < 0:
+            cmd.extend([f"-lat=-{abs(latitude_tg)}"])
+        else:
+            cmd.extend(["-lat", str(latitude_tg)])
+        
+        # Use the -lon=VALUE format for negative longitude values
+        if longitude_tg < 0:
+            cmd.extend([f"-lon=-{abs(longitude_tg)}"])
+        else:
+            cmd.extend(["-lon", str(longitude_tg)])
+        
+        # Always pass radius in km to the backend as an integer
+        cmd.extend(["-r", str(int(radius_tg))])
+    
+    if only_with_power_tg:
+        cmd.extend(["-p", str(min_power_tg)])
+    
+    if six_digit_tg:
+        cmd.extend(["-6"])
+    
+    if callsign_filter_tg:
+        cmd.extend(["-cs", callsign_filter_tg])
+    
+    if combine_tg:
+        cmd.extend(["--combine", str(combine_files_tg)])
+    
+    if memory_profile:
+        cmd.extend(["--memprofile"])
+    
+    # Show what the job will cost while the filters are changed
+    if selection_error is None:
+        show_estimate(cmd)
     
     if st.button("Generate Talkgroup Files", key="generate_talkgroup"):
-        if search_type_tg == "mcc" and not mcc_tg:
-            st.error("Please enter an MCC code or country code")
-        elif search_type_tg == "qth" and not qth_tg:
-            st.error("Please enter a QTH locator")
-        elif search_type_tg == "gps" and (latitude_tg == 0 and longitude_tg == 0):
-            st.error("Please enter valid GPS coordinates")
+        if selection_error:
+            st.error(selection_error)
         else:
-            # Build command with user-specific output directory
-            user_output_dir = f"output_{session_id}"
-            cmd = ["python", "zone.py", "-b", band_tg, "-t", search_type_tg, "-tg", "-o", user_output_dir]
-            
-            # Add city prefix option if selected
-            if use_city_prefix:
-                cmd.extend(["--city-prefix"])
-            
-            if force_download_tg:
-                cmd.extend(["-f"])
-            
-            if search_type_tg == "mcc":
-                cmd.extend(["-m", mcc_tg])
-            elif search_type_tg == "qth":
-                # Always pass radius in km to the backend as an integer
-                cmd.extend(["-q", qth_tg, "-r", str(int(radius_tg))])
-            elif search_type_tg == "gps":
-                # Handle negative coordinates using the format from README example
-                if latitude_tg < 0:
-                    cmd.extend([f"-lat=-{abs(latitude_tg)}"])
-                else:
-                    cmd.extend(["-lat", str(latitude_tg)])
-                
-                # Use the -lon=VALUE format for negative longitude values
-                if longitude_tg < 0:
-                    cmd.extend([f"-lon=-{abs(longitude_tg)}"])
-                else:
-                    cmd.extend(["-lon", str(longitude_tg)])
-                
-                # Always pass radius in km to the backend as an integer
-                cmd.extend(["-r", str(int(radius_tg))])
-            
-            if only_with_power_tg:
-                cmd.extend(["-p", str(min_power_tg)])
-            
-            if six_digit_tg:
-                cmd.extend(["-6"])
-            
-            if callsign_filter_tg:
-                cmd.extend(["-cs", callsign_filter_tg])
-            
             # Show command
             cmd_str = " ".join(cmd)
             st.code(cmd_str, language="bash")
             
             # Run command
             with st.spinner("Generating talkgroup files..."):
-                process = subprocess.Popen(
-                    cmd, 
-                    stdout=subprocess.PIPE, 
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-                output, error = process.communicate()
+                returncode, output, error = run_generator(cmd)
                 
-                if process.returncode == 0:
+                if returncode == 0:
                     st.success("Talkgroup files generated successfully!")
-                    st.code(output)
                     
                     # Find generated XML files and contacts.csv in user-specific output directory
                     output_dir = f"output_{session_id}"
                     if not os.path.exists(output_dir):
                         os.makedirs(output_dir)
-                    xml_files = [f for f in os.listdir(output_dir) if f.endswith('.xml')]
-                    
-                    if xml_files:
-                        st.subheader("Download Generated Zone Files")
+                    run_summary = load_run_summary(output_dir)
+                    if run_summary is not None:
+                        show_run_summary(run_summary, output)
+                    else:
+                        st.code(output)
+                    xml_files = list_xml_files(output_dir, run_summary)
+                    profile = start_app_profile()
+                    try:
+                        if xml_files:
+                            st.subheader("Download Generated Zone Files")
                         
-                        # Create a zip file with all generated files
-                        import io
-                        import zipfile
+                            # Create a zip file with all generated files
+                            import io
+                            import zipfile
                         
-                        # Create a download button for all files in a zip
-                        if xml_files or os.path.exists(os.path.join(output_dir, "contacts.csv")):
-                            zip_buffer = io.BytesIO()
-                            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                                # Add all XML files
-                                for xml_file in xml_files:
-                                    file_path = os.path.join(output_dir, xml_file)
-                                    with open(file_path, "r") as file:
-                                        zip_file.writestr(xml_file, file.read())
+                            # Create a download button for all files in a zip
+                            if xml_files or os.path.exists(os.path.join(output_dir, "contacts.csv")):
+                                zip_buffer = io.BytesIO()
+                                with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                                    # Add all XML files
+                                    for xml_file in xml_files:
+                                        file_path = os.path.join(output_dir, xml_file)
+                                        with open(file_path, "r") as file:
+                                            zip_file.writestr(xml_file, file.read())
                                 
-                                # Add contacts.csv if it exists
-                                contacts_file = os.path.join(output_dir, "contacts.csv")
-                                if os.path.exists(contacts_file):
-                                    with open(contacts_file, "r") as file:
-                                        zip_file.writestr("contacts.csv", file.read())
+                                    # Add contacts.csv if it exists
+                                    contacts_file = os.path.join(output_dir, "contacts.csv")
+                                    if os.path.exists(contacts_file):
+                                        with open(contacts_file, "r") as file:
+                                            zip_file.writestr("contacts.csv", file.read())
                             
-                            # Create download button for the zip file
-                            zip_buffer.seek(0)
-                            zip_bytes = zip_buffer.getvalue()
-                            b64_zip = base64.b64encode(zip_bytes).decode()
-                            zip_filename = f"mototrbo_files_{session_id[:8]}.zip"
-                            st.download_button(
-                                label="📦 Download All Files as ZIP",
-                                data=zip_bytes,
-                                file_name=zip_filename,
-                                mime="application/zip",
-                                key="download_all_zip"
-                            )
+                                # Create download button for the zip file
+                                zip_buffer.seek(0)
+                                zip_bytes = zip_buffer.getvalue()
+                                b64_zip = base64.b64encode(zip_bytes).decode()
+                                zip_filename = f"mototrbo_files_{session_id[:8]}.zip"
+                                st.download_button(
+                                    label="📦 Download All Files as ZIP",
+                                    data=zip_bytes,
+                                    file_name=zip_filename,
+                                    mime="application/zip",
+                                    key="download_all_zip"
+                                )
                             
-                            # Horizontal line to separate individual file downloads
-                            st.markdown("---")
-                            st.markdown("Or download individual files:")
+                                # Horizontal line to separate individual file downloads
+                                st.markdown("---")
+                                st.markdown("Or download individual files:")
                         
-                        # Individual file downloads
-                        for xml_file in xml_files:
-                            file_path = os.path.join(output_dir, xml_file)
-                            with open(file_path, "r") as file:
-                                file_content = file.read()
+                            # Individual file downloads
+                            for xml_file in xml_files:
+                                file_path = os.path.join(output_dir, xml_file)
+                                with open(file_path, "r") as file:
+                                    file_content = file.read()
                                 
-                            b64 = base64.b64encode(file_content.encode()).decode()
-                            href = f'<a href="data:application/octet-stream;base64,{b64}" download="{xml_file}">Download {xml_file}</a>'
-                            st.markdown(href, unsafe_allow_html=True)
+                                b64 = base64.b64encode(file_content.encode()).decode()
+                                href = f'<a href="data:application/octet-stream;base64,{b64}" download="{xml_file}">Download {xml_file}</a>'
+                                st.markdown(href, unsafe_allow_html=True)
                     
-                    contacts_file = os.path.join(output_dir, "contacts.csv")
-                    if os.path.exists(contacts_file):
-                        st.subheader("Contacts CSV")
+                        contacts_file = os.path.join(output_dir, "contacts.csv")
+                        if os.path.exists(contacts_file):
+                            st.subheader("Contacts CSV")
                         
-                        # Display contacts as a table
-                        try:
-                            contacts_df = pd.read_csv(contacts_file)
-                            st.dataframe(contacts_df)
-                        except:
-                            st.warning("Could not display contacts.csv as a table")
+                            # Display contacts as a table
+                            try:
+                                contacts_df = pd.read_csv(contacts_file)
+                                st.dataframe(contacts_df)
+                            except:
+                                st.warning("Could not display contacts.csv as a table")
                         
-                        # Provide download link
-                        with open(contacts_file, "r") as file:
-                            file_content = file.read()
+                            # Provide download link
+                            with open(contacts_file, "r") as file:
+                                file_content = file.read()
                             
-                        b64 = base64.b64encode(file_content.encode()).decode()
-                        href = f'<a href="data:text/csv;base64,{b64}" download="contacts.csv">Download contacts.csv</a>'
-                        st.markdown(href, unsafe_allow_html=True)
+                            b64 = base64.b64encode(file_content.encode()).decode()
+                            href = f'<a href="data:text/csv;base64,{b64}" download="contacts.csv">Download contacts.csv</a>'
+                            st.markdown(href, unsafe_allow_html=True)
+                    finally:
+                        app_stage = stop_app_profile(profile)
+                    show_memory_profile(run_summary, app_stage)
                     
-                    # Clean up user-specific contact_uploads directory
-                    user_uploads_dir = f"contact_uploads_{session_id}"
-                    if os.path.exists(user_uploads_dir):
-                        for file in os.listdir(user_uploads_dir):
-                            file_path = os.path.join(user_uploads_dir, file)
-                            try:
-                                if os.path.isfile(file_path):
-                                    os.unlink(file_path)
-                            except Exception as e:
-                                st.warning(f"Error deleting {file_path}: {e}")
+                    # Remove the contact template index of this session, an upload is indexed again for the next job
+                    template_path = os.path.join("contact_templates", f"{session_id}.json")
+                    if os.path.exists(template_path):
+                        try:
+                            os.unlink(template_path)
+                        except OSError as e:
+                            st.warning(f"Error deleting {template_path}: {e}")
                 else:
                     st.error("Error generating talkgroup files")
                     st.code(error)
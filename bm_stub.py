@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+import urllib3
+
+
+parser = argparse.ArgumentParser(description='Record BrandMeister API responses into fixtures and replay them '
+                                             'from a local stand-in server.')
+subparsers = parser.add_subparsers(dest='command', required=True)
+
+record_parser = subparsers.add_parser('record', help='Fetch responses from the real API into fixtures.')
+record_parser.add_argument('-d', '--fixtures', default='fixtures',
+                           help='Fixture directory. Default is "fixtures".')
+record_parser.add_argument('-m', '--mcc', default='',
+                           help='Only record talkgroups of repeaters whose ID starts with these digits.')
+record_parser.add_argument('-l', '--limit', default=50, type=int,
+                           help='Maximum number of repeaters to record talkgroups for. Defaults to 50.')
+record_parser.add_argument('--api-url', default='https://api.brandmeister.network/v2',
+                           help='BrandMeister API base URL.')
+
+serve_parser = subparsers.add_parser('serve', help='Replay fixtures over HTTP.')
+serve_parser.add_argument('-d', '--fixtures', default='fixtures',
+                          help='Fixture directory. Default is "fixtures".')
+serve_parser.add_argument('--host', default='127.0.0.1', help='Address to listen on. Default is 127.0.0.1.')
+serve_parser.add_argument('--port', default=8765, type=int, help='Port to listen on. Default is 8765.')
+serve_parser.add_argument('--latency', default=0, type=float,
+                          help='Mean response latency in milliseconds. Defaults to 0.')
+serve_parser.add_argument('--jitter', default=0, type=float,
+                          help='Random latency added on top of --latency, up to this many milliseconds.')
+serve_parser.add_argument('--error-rate', default=0, type=float,
+                          help='Fraction of requests answered with 500 Internal Server Error.')
+serve_parser.add_argument('--throttle-rate', default=0, type=float,
+                          help='Fraction of requests answered with 429 Too Many Requests.')
+serve_parser.add_argument('--retry-after', default=1, type=int,
+                          help='Retry-After seconds sent with 429 responses. Defaults to 1.')
+serve_parser.add_argument('--synthesize', action='store_true',
+                          help='Answer talkgroup requests without a fixture with generated, stable data.')
+serve_parser.add_argument('--seed', type=int, help='Random seed for latency and error injection.')
+
+# API paths below the base URL and the fixture files they are stored in
+routes = [
+    (re.compile(r'^/device$'), 'device.json'),
+    (re.compile(r'^/device/(\d+)/talkgroup$'), 'device/{0}/talkgroup.json'),
+    (re.compile(r'^/talkgroup/(\d+)$'), 'talkgroup/{0}.json'),
+]
+
+
+def fixture_path(fixtures, path):
+    """Map an API path like "/device/310123/talkgroup" to its fixture file, None for unknown paths"""
+    for pattern, template in routes:
+        match = pattern.match(path)
+        if match:
+            return os.path.join(fixtures, template.format(*match.groups()))
+
+    return None
+
+
+def write_fixture(fixtures, path, data):
+    file_name = fixture_path(fixtures, path)
+    os.makedirs(os.path.dirname(file_name) or '.', exist_ok=True)
+
+    with open(file_name, 'w') as file:
+        json.dump(data, file)
+
+
+def record(fixtures, api_url, mcc, limit):
+    """
+    Fetch the device list, talkgroups of selected repeaters and their talkgroup names into fixtures
+
+    Args:
+        fixtures (str): Fixture directory
+        api_url (str): BrandMeister API base URL
+        mcc (str): Repeater ID prefix selecting repeaters to record talkgroups for
+        limit (int): Maximum number of repeaters to record talkgroups for
+    """
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    def fetch(path):
+        response = requests.get(api_url.rstrip('/') + path, verify=False)
+        response.raise_for_status()
+        write_fixture(fixtures, path, response.json())
+        time.sleep(0.2)  # Be nice to the API
+        return response.json()
+
+    devices = fetch('/device')
+    print(f'Recorded {len(devices)} devices')
+
+    repeater_ids = [item['id'] for item in devices if str(item['id']).startswith(mcc)][:limit]
+    talkgroups = set()
+
+    for repeater_id in repeater_ids:
+        try:
+            for tg in fetch(f'/device/{repeater_id}/talkgroup'):
+                if 'talkgroup' in tg:
+                    talkgroups.add(tg['talkgroup'])
+        except Exception as e:
+            print(f'Error recording talkgroups for repeater {repeater_id}: {e}')
+
+    print(f'Recorded talkgroups of {len(repeater_ids)} repeaters')
+
+    for tg_id in sorted(talkgroups):
+        try:
+            fetch(f'/talkgroup/{tg_id}')
+        except Exception as e:
+            print(f'Error recording talkgroup {tg_id}: {e}')
+
+    print(f'Recorded {len(talkgroups)} talkgroup names')
+
+
+def synthesize_response(path):
+    """Stable made up response for a talkgroup path without a fixture"""
+    match = routes[1][0].match(path)
+    if match:
+        seed = zlib.crc32(match.group(1).encode())
+        local_tg = int(match.group(1)[:3] + '0') + seed % 10
+        return [{'talkgroup': str(91 + seed % 3), 'slot': 1, 'repeaterid': match.group(1)},
+                {'talkgroup': str(local_tg), 'slot': 2, 'repeaterid': match.group(1)}]
+
+    match = routes[2][0].match(path)
+    if match:
+        return {'ID': int(match.group(1)), 'Name': f'Talkgroup {match.group(1)}'}
+
+    return None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Replays fixtures, set up through the attributes of the server it is attached to"""
+
+    def do_GET(self):
+        config = self.server.stub
+        path = self.path.split('?')[0]
+
+        with config['lock']:
+            config['requests'] += 1
+            delay = config['latency'] + config['random'].uniform(0, config['jitter'])
+            roll = config['random'].random()
+
+        if delay:
+            time.sleep(delay / 1000)
+
+        if roll < config['throttle_rate']:
+            self.reply(429, {'message': 'Too Many Requests'}, {'Retry-After': str(config['retry_after'])})
+            return
+
+        if roll < config['throttle_rate'] + config['error_rate']:
+            self.reply(500, {'message': 'Injected error'})
+            return
+
+        if not path.startswith('/v2/'):
+            self.reply(404, {'message': 'Not found'})
+            return
+
+        data = load_fixture(config, path[len('/v2'):])
+        if data is None:
+            self.reply(404, {'message': 'Not found'})
+        else:
+            self.reply(200, data)
+
+    def reply(self, status, data, headers=None):
+        body = data if isinstance(data, bytes) else json.dumps(data).encode()
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.stub['verbose']:
+            super().log_message(format, *args)
+
+
+def load_fixture(config, path):
+    """Fixture contents for an API path as encoded JSON, kept in memory after the first read"""
+    with config['lock']:
+        if path in config['responses']:
+            return config['responses'][path]
+
+    file_name = fixture_path(config['fixtures'], path)
+    data = None
+
+    if file_name and os.path.exists(file_name):
+        with open(file_name, 'rb') as file:
+            data = file.read()
+    elif file_name and config['synthesize']:
+        generated = synthesize_response(path)
+        data = json.dumps(generated).encode() if generated is not None else None
+
+    with config['lock']:
+        config['responses'][path] = data
+
+    return data
+
+
+def make_server(fixtures='fixtures', host='127.0.0.1', port=8765, latency=0, jitter=0, error_rate=0,
+                throttle_rate=0, retry_after=1, synthesize=False, seed=None, verbose=False):
+    """
+    Create the stand-in server without starting it
+
+    Port 0 picks a free port, see server.server_address. Call serve_forever(), e.g. from a thread,
+    and shutdown() when done.
+
+    Returns:
+        ThreadingHTTPServer: Server with the request count in server.stub['requests']
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.stub = {
+        'fixtures': fixtures,
+        'latency': latency,
+        'jitter': jitter,
+        'error_rate': error_rate,
+        'throttle_rate': throttle_rate,
+        'retry_after': retry_after,
+        'synthesize': synthesize,
+        'verbose': verbose,
+        'random': random.Random(seed),
+        'lock': threading.Lock(),
+        'responses': {},
+        'requests': 0,
+    }
+
+    return server
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record(args.fixtures, args.api_url, args.mcc, args.limit)
+    else:
+        server = make_server(args.fixtures, args.host, args.port, args.latency, args.jitter, args.error_rate,
+                             args.throttle_rate, args.retry_after, args.synthesize, args.seed, verbose=True)
+        host, port = server.server_address[:2]
+        print(f'Serving {args.fixtures} as http://{host}:{port}/v2, use zone.py --api-url http://{host}:{port}/v2')
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,155 @@
+import csv
+import io
+import json
+import os
+
+
+# Columns of a CPS2 contact export zone.py reads and writes
+NAME_COLUMN = 0
+ID_COLUMN = 25
+CALL_TYPE_COLUMN = 30
+# A CPS2 export starts with a row of field names and a row of display names
+HEADER_ROWS = 2
+ID_FIELD = 'DigitalCalls-DU_CALLLSTID'
+index_version = 1
+
+
+class TemplateError(ValueError):
+    """The file is not a CPS2 contact export zone.py can use"""
+
+
+class ContactTemplate:
+    """
+    Contact template parsed once and indexed by talkgroup ID
+
+    Rows are kept as they were read, header rows included, so contacts.csv is written back
+    unchanged. Contacts missing a column zone.py needs are reported in problems, talkgroup IDs
+    used by several contacts in duplicates.
+    """
+
+    def __init__(self, rows, source=''):
+        self.rows = rows
+        self.source = source
+        # Contact name by talkgroup ID, empty for unnamed contacts. The first named contact wins.
+        self.names = {}
+        # Row numbers of every contact of a talkgroup ID used more than once
+        self.duplicates = {}
+        self.problems = []
+
+        seen = {}
+        for number, row in enumerate(rows[HEADER_ROWS:], HEADER_ROWS + 1):
+            if len(row) <= ID_COLUMN:
+                self.problems.append(f'Row {number} has {len(row)} columns, the contact ID is column '
+                                     f'{ID_COLUMN + 1}. It is kept without an ID.')
+                continue
+            if number == HEADER_ROWS + 1 and len(row) <= CALL_TYPE_COLUMN:
+                self.problems.append(f'Row {number} has {len(row)} columns, contacts added for new talkgroups '
+                                     f'copy it and are padded to {CALL_TYPE_COLUMN + 1}.')
+
+            tg_id = row[ID_COLUMN]
+            if not tg_id:
+                continue
+            if not tg_id.isdigit():
+                self.problems.append(f'Row {number}: contact ID "{tg_id}" is not a number.')
+
+            seen.setdefault(tg_id, []).append(number)
+            if not self.names.get(tg_id):
+                self.names[tg_id] = row[NAME_COLUMN]
+
+        self.duplicates = {tg_id: numbers for tg_id, numbers in seen.items() if len(numbers) > 1}
+        for tg_id, numbers in self.duplicates.items():
+            self.problems.append(f'Talkgroup {tg_id} is in rows {", ".join(map(str, numbers))}, '
+                                 f'channels are named "{self.names[tg_id]}".')
+
+    @property
+    def contacts(self):
+        return self.rows[HEADER_ROWS:]
+
+    def index(self):
+        """Talkgroup contacts as dicts for a preview table"""
+        return [{'Talkgroup': tg_id, 'Name': name, 'Duplicate': tg_id in self.duplicates}
+                for tg_id, name in self.names.items()]
+
+    def write_csv(self, file_name):
+        with open(file_name, 'w', newline='') as file:
+            csv.writer(file).writerows(self.rows)
+
+    def to_json(self):
+        return {
+            'version': index_version,
+            'source': self.source,
+            'rows': self.rows,
+            'names': self.names,
+            'duplicates': self.duplicates,
+            'problems': self.problems,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        template = cls.__new__(cls)
+        template.rows = data['rows']
+        template.source = data['source']
+        template.names = data['names']
+        template.duplicates = data['duplicates']
+        template.problems = data['problems']
+        return template
+
+
+def ingest(data, source=''):
+    """
+    Parse and validate an uploaded contact template
+
+    Args:
+        data (bytes or str): CSV exported from CPS2
+        source (str): File name shown in messages
+
+    Returns:
+        ContactTemplate: Indexed template
+
+    Raises:
+        TemplateError: If the file is not a CPS2 contact export
+    """
+    if isinstance(data, bytes):
+        try:
+            data = data.decode('utf-8')
+        except UnicodeDecodeError:
+            raise TemplateError(f'{source or "Contact template"} is not UTF-8 text')
+
+    try:
+        rows = list(csv.reader(io.StringIO(data, newline='')))
+    except csv.Error as e:
+        raise TemplateError(f'{source or "Contact template"} is not a valid CSV file: {e}')
+
+    if len(rows) < HEADER_ROWS:
+        raise TemplateError(f'{source or "Contact template"} needs the two header rows of a CPS2 contact export')
+    if len(rows[0]) <= ID_COLUMN or rows[0][ID_COLUMN] != ID_FIELD:
+        raise TemplateError(f'{source or "Contact template"} is not a CPS2 contact export, column '
+                            f'{ID_COLUMN + 1} of the first row must be {ID_FIELD}')
+
+    return ContactTemplate(rows, source)
+
+
+def store(template, file_name):
+    """Write the indexed template as JSON next to the job, replacing an older one atomically"""
+    temp_file = f'{file_name}.tmp'
+    with open(temp_file, 'w') as file:
+        json.dump(template.to_json(), file)
+    os.replace(temp_file, file_name)
+
+
+def load(file_name):
+    """
+    Read a template stored by store(), or ingest a CSV template
+
+    Raises:
+        TemplateError: If a CSV is not a CPS2 contact export or the index is from another version
+    """
+    if file_name.endswith('.json'):
+        with open(file_name, 'r') as file:
+            data = json.load(file)
+        if data.get('version') != index_version:
+            raise TemplateError(f'{file_name} was stored by another version, upload the template again')
+        return ContactTemplate.from_json(data)
+
+    with open(file_name, 'rb') as file:
+        return ingest(file.read(), os.path.basename(file_name))
@@ -0,0 +1,110 @@
+import json
+import os
+import subprocess
+import time
+
+import admission
+import precompute
+from zone import parse_mcc
+
+
+def job_mode(cmd):
+    return 'talkgroup' if '-tg' in cmd or '--talkgroups' in cmd else 'standard'
+
+
+def output_dir_of(cmd):
+    for number, token in enumerate(cmd):
+        if token in ('-o', '--output') and number + 1 < len(cmd):
+            return cmd[number + 1]
+        if token.startswith('--output='):
+            return token.split('=', 1)[1]
+
+    return 'output'
+
+
+def load_run_summary(output_dir):
+    """Run summary zone.py writes with --format json, None if the run did not write one"""
+    summary_file = os.path.join(output_dir, 'run_summary.json')
+    if not os.path.exists(summary_file):
+        return None
+
+    try:
+        with open(summary_file, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def run_generator(cmd, controller, app_metrics, session_id, on_wait=None, ticket=None):
+    """
+    Run zone.py once the admission controller lets the job start and record it in the metrics
+
+    Args:
+        cmd (list): zone.py command line, the run summary is read from its -o directory
+        controller (AdmissionController): Admission queue shared by all jobs of the process
+        app_metrics (AppMetrics): Metrics the job is recorded in
+        session_id (str): Session or client the job counts against
+        on_wait (callable): Called with the queue position and controller status about every second while
+            queued, and with position 0 once the job starts
+        ticket (Ticket): Ticket already submitted for the job, None to submit it here
+
+    Returns:
+        tuple: Return code, None if the session already has as many jobs as it may have, stdout and stderr
+    """
+    mode = job_mode(cmd)
+    if ticket is None:
+        ticket = controller.submit(session_id, admission.estimate_cost(cmd))
+        if ticket is None:
+            app_metrics.record_job(mode, 'rejected')
+            return None, '', 'You already have a generation job running or queued, please wait until it finishes.'
+
+    queued = time.monotonic()
+    started = None
+    returncode = None
+    try:
+        while not controller.wait(ticket, timeout=1):
+            if on_wait is not None:
+                on_wait(controller.position(ticket), controller.status())
+        if on_wait is not None:
+            on_wait(0, controller.status())
+
+        started = time.monotonic()
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        output, error = process.communicate()
+        returncode = process.returncode
+        return returncode, output, error
+    finally:
+        controller.release(ticket)
+        finished = time.monotonic()
+        run_summary = load_run_summary(output_dir_of(cmd)) if returncode == 0 else None
+        app_metrics.record_job(mode, 'ok' if returncode == 0 else 'failed', (started or finished) - queued,
+                               finished - started if started is not None else None, run_summary)
+
+
+def find_standard_pack(mcc, band, six_digit, min_power, zone_capacity):
+    """Precomputed Standard Mode pack matching the request, see precompute.py and MOTOBM_PACKS_DIR"""
+    if zone_capacity != precompute.zone_capacity:
+        return None
+
+    try:
+        prefixes = parse_mcc(mcc)
+    except ValueError:
+        return None
+
+    # Packs are made per MCC, several countries or a longer prefix need the generator
+    if len(prefixes) != 1 or len(prefixes[0]) != 3:
+        return None
+
+    return precompute.find_pack(os.environ.get('MOTOBM_PACKS_DIR', 'packs'), prefixes[0], band, six_digit, min_power)
+
+
+def serve_pack(pack, zone_name, output_dir, app_metrics):
+    """Write a pack into the output directory under the requested zone name, as if zone.py had run"""
+    try:
+        precompute.unpack(pack, zone_name, output_dir)
+    except Exception as e:
+        app_metrics.record_job('standard', 'failed')
+        return 1, '', f'Could not read precomputed pack {os.path.basename(pack)}: {e}'
+
+    app_metrics.record_job('standard', 'precomputed')
+    return 0, f'Served from precomputed pack {os.path.basename(pack)}', ''
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+
+import argparse
+import base64
+import io
+import json
+import os
+import resource
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import bm_stub
+
+
+parser = argparse.ArgumentParser(description='Simulate concurrent web app sessions generating zone files '
+                                             'against a stubbed BrandMeister API.')
+
+parser.add_argument('-s', '--sessions', default=4, type=int, help='Number of concurrent sessions. Defaults to 4.')
+parser.add_argument('-j', '--jobs', default=3, type=int, help='Jobs run one after another by every session. '
+                                                                'Defaults to 3.')
+parser.add_argument('--talkgroup-share', default=0.5, type=float,
+                    help='Fraction of jobs run in talkgroup mode, the rest use standard mode. Defaults to 0.5.')
+parser.add_argument('--standard-args', help='zone.py selection arguments for standard mode jobs. '
+                                            'Defaults to the most common MCC in the fixtures.')
+parser.add_argument('--talkgroup-args', help='zone.py selection arguments for talkgroup mode jobs. '
+                                             'Defaults to the most common MCC in the fixtures.')
+parser.add_argument('-d', '--fixtures', default='fixtures', help='bm_stub.py fixture directory. '
+                                                                 'Default is "fixtures".')
+parser.add_argument('--latency', default=50, type=float, help='Stub API latency in milliseconds. Defaults to 50.')
+parser.add_argument('--jitter', default=20, type=float, help='Stub API latency jitter in milliseconds. '
+                                                             'Defaults to 20.')
+parser.add_argument('--error-rate', default=0, type=float, help='Fraction of stub API requests failing with 500.')
+parser.add_argument('--throttle-rate', default=0, type=float, help='Fraction of stub API requests answered '
+                                                                   'with 429.')
+parser.add_argument('--cache', action='store_true',
+                    help='Let jobs share the API cache as on the real host. By default every job is cold.')
+parser.add_argument('--memprofile', action='store_true',
+                    help='Run jobs with zone.py --memprofile and report the highest peak memory of each stage.')
+parser.add_argument('--workdir', help='Directory jobs run in. Defaults to a temporary directory removed afterwards.')
+parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_selection(fixtures):
+    """Selection arguments for the MCC with most repeaters in the fixtures"""
+    with open(os.path.join(fixtures, 'device.json'), 'r') as file:
+        prefixes = Counter(str(item['id'])[:3] for item in json.load(file) if len(str(item['id'])) == 6)
+
+    return ['-b', 'uhf', '-t', 'mcc', '-m', prefixes.most_common(1)[0][0], '-6']
+
+
+def percentile(values, percent):
+    """Nearest rank percentile of a list of numbers"""
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+
+    return ordered[int(rank) - 1]
+
+
+def directory_size(path):
+    total = 0
+
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+
+    return total
+
+
+def process_rss(pid):
+    """Resident memory of a process in bytes, 0 if it is gone"""
+    try:
+        with open(f'/proc/{pid}/status', 'r') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    return 0
+
+
+class LoadTest:
+    """Runs the sessions and keeps the measurements"""
+
+    def __init__(self, workdir, api_url, selections, talkgroup_share, cache, memprofile=False):
+        self.workdir = workdir
+        self.api_url = api_url
+        self.selections = selections
+        self.talkgroup_share = talkgroup_share
+        self.cache = cache
+        self.memprofile = memprofile
+        self.lock = threading.Lock()
+        self.children = set()
+        self.results = []
+        self.peak_rss = 0
+        self.peak_disk = 0
+        self.running = True
+
+    def build_command(self, session_id, talkgroups):
+        """Command line as app.py builds it for the session"""
+        cmd = [sys.executable, 'zone.py', '-o', f'output_{session_id}', '--api-url', self.api_url]
+
+        if talkgroups:
+            cmd.extend(['-tg'] + self.selections['talkgroup'])
+        else:
+            cmd.extend(['-n', 'Load test'] + self.selections['standard'])
+
+        if not self.cache:
+            cmd.extend(['--cache-ttl', '0'])
+
+        if self.memprofile:
+            cmd.extend(['--memprofile', '--format', 'quiet'])
+
+        return cmd
+
+    def run_job(self, session_id, talkgroups):
+        started = time.perf_counter()
+        process = subprocess.Popen(self.build_command(session_id, talkgroups), cwd=self.workdir,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+        with self.lock:
+            self.children.add(process.pid)
+        output, error = process.communicate()
+        with self.lock:
+            self.children.discard(process.pid)
+
+        stages = []
+        if process.returncode == 0:
+            output_dir = os.path.join(self.workdir, f'output_{session_id}')
+            self.serve_files(output_dir)
+            if self.memprofile:
+                with open(os.path.join(output_dir, 'memory_profile.json'), 'r') as file:
+                    stages = json.load(file)['stages']
+
+        return {
+            'mode': 'talkgroup' if talkgroups else 'standard',
+            'ok': process.returncode == 0,
+            'seconds': time.perf_counter() - started,
+            'error': error.strip()[-500:] if process.returncode else '',
+            'memory': stages,
+        }
+
+    def serve_files(self, output_dir):
+        """Mirrors what app.py does with the results of a job: zip in memory plus base64 links"""
+        files = [f for f in os.listdir(output_dir) if f.endswith('.xml') or f == 'contacts.csv']
+
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for name in files:
+                with open(os.path.join(output_dir, name), 'r') as file:
+                    zip_file.writestr(name, file.read())
+        base64.b64encode(zip_buffer.getvalue())
+
+        for name in files:
+            with open(os.path.join(output_dir, name), 'r') as file:
+                base64.b64encode(file.read().encode())
+
+    def run_session(self, number, jobs):
+        session_id = uuid.uuid4().hex
+        results = []
+
+        for job in range(jobs):
+            # Spread talkgroup jobs evenly over sessions and jobs
+            index = number * jobs + job
+            talkgroups = int((index + 1) * self.talkgroup_share) > int(index * self.talkgroup_share)
+            results.append(self.run_job(session_id, talkgroups))
+
+        with self.lock:
+            self.results.extend(results)
+
+    def sample(self, interval=0.2):
+        """Track peak memory of this process plus running jobs and disk used by output directories"""
+        while self.running:
+            with self.lock:
+                pids = list(self.children)
+            rss = process_rss(os.getpid()) + sum(process_rss(pid) for pid in pids)
+            disk = sum(directory_size(os.path.join(self.workdir, name)) for name in os.listdir(self.workdir)
+                       if name.startswith('output_'))
+
+            self.peak_rss = max(self.peak_rss, rss)
+            self.peak_disk = max(self.peak_disk, disk)
+            time.sleep(interval)
+
+    def run(self, sessions, jobs):
+        sampler = threading.Thread(target=self.sample, daemon=True)
+        sampler.start()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as executor:
+            list(executor.map(lambda number: self.run_session(number, jobs), range(sessions)))
+        elapsed = time.perf_counter() - started
+
+        self.running = False
+        sampler.join()
+
+        return self.report(sessions, elapsed)
+
+    def report(self, sessions, elapsed):
+        report = {
+            'sessions': sessions,
+            'jobs': len(self.results),
+            'failed': sum(1 for result in self.results if not result['ok']),
+            'elapsed': round(elapsed, 3),
+            'throughput': round(len(self.results) / elapsed, 3) if elapsed else None,
+            'peak_rss_mb': round(max(self.peak_rss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024)
+                                 / 2 ** 20, 1),
+            'peak_disk_mb': round(self.peak_disk / 2 ** 20, 2),
+            'latency': {},
+            'errors': sorted({result['error'] for result in self.results if result['error']}),
+        }
+
+        for mode in ('all', 'standard', 'talkgroup'):
+            seconds = [result['seconds'] for result in self.results if mode in ('all', result['mode'])]
+            if seconds:
+                report['latency'][mode] = {
+                    'count': len(seconds),
+                    'p50': round(percentile(seconds, 50), 3),
+                    'p95': round(percentile(seconds, 95), 3),
+                    'p99': round(percentile(seconds, 99), 3),
+                    'max': round(max(seconds), 3),
+                }
+
+        if self.memprofile:
+            report['memory_peak_mb'] = {}
+            for result in self.results:
+                peaks = report['memory_peak_mb'].setdefault(result['mode'], {})
+                for stage in result['memory']:
+                    peaks[stage['stage']] = max(peaks.get(stage['stage'], 0), round(stage['peak_bytes'] / 2 ** 20, 1))
+
+        return report
+
+
+def prepare_workdir(workdir, api_url):
+    """Copy the files zone.py needs next to it and download BM.json from the stub once"""
+    for name in ('zone.py', 'contacts.py', 'contact_template.csv', 'custom-values.xml'):
+        shutil.copy(os.path.join(base_dir, name), workdir)
+
+    # Warm mode with a prefix no repeater ID starts with only downloads BM.json
+    subprocess.run([sys.executable, 'zone.py', '--warm', '-f', '-b', 'uhf', '-t', 'mcc', '-m', '0',
+                    '--api-url', api_url, '--cache-ttl', '0'], cwd=workdir, check=True, capture_output=True)
+
+
+def print_report(report):
+    print(f"{report['jobs']} jobs in {report['sessions']} sessions, {report['failed']} failed, "
+          f"{report['elapsed']}s, {report['throughput']} jobs/s")
+    print(f"Peak RSS {report['peak_rss_mb']} MB, peak disk {report['peak_disk_mb']} MB")
+
+    for mode, latency in report['latency'].items():
+        print(f"{mode:10} n={latency['count']:<4} p50={latency['p50']}s p95={latency['p95']}s "
+              f"p99={latency['p99']}s max={latency['max']}s")
+
+    for mode, peaks in report.get('memory_peak_mb', {}).items():
+        print(f"{mode:10} peak MB " + ' '.join(f'{stage}={peak}' for stage, peak in peaks.items()))
+
+    for error in report['errors']:
+        print(f'Error: {error}')
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    selections = {
+        'standard': shlex.split(args.standard_args) if args.standard_args else default_selection(args.fixtures),
+        'talkgroup': shlex.split(args.talkgroup_args) if args.talkgroup_args else default_selection(args.fixtures),
+    }
+
+    server = bm_stub.make_server(os.path.abspath(args.fixtures), port=0, latency=args.latency, jitter=args.jitter,
+                                 error_rate=args.error_rate, throttle_rate=args.throttle_rate, synthesize=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    api_url = f'http://{host}:{port}/v2'
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='motobm_load_')
+    os.makedirs(workdir, exist_ok=True)
+
+    try:
+        prepare_workdir(workdir, api_url)
+        report = LoadTest(workdir, api_url, selections, args.talkgroup_share, args.cache,
+                          args.memprofile).run(args.sessions, args.jobs)
+        report['api_requests'] = server.stub['requests']
+    finally:
+        server.shutdown()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+        print(f"Stub API requests: {report['api_requests']}")
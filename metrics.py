@@ -0,0 +1,286 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Upper bounds in seconds of the job latency histogram buckets, standard mode takes seconds, talkgroup mode minutes
+job_buckets = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base of the metric types, keeps one value per combination of label values"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f'{self.name} has labels {", ".join(self.labels)}, got {", ".join(labels)}')
+
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self):
+        """Lines of the text format for this metric without HELP and TYPE"""
+        with self.lock:
+            return [f'{self.name}{format_labels(self.labels, key)} {format_value(value)}'
+                    for key, value in sorted(self.values.items())]
+
+    def render(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}'] + self.samples()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError('counters can only increase')
+
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Gauge set directly, or read from a function at every scrape"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, labels=(), function=None):
+        super().__init__(name, help, labels)
+        self.function = function
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                self.set(self.function())
+            except Exception:
+                pass  # Keep the last value, a failing collector must not break the endpoint
+
+        return super().samples()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=job_buckets):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0))
+            for number, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[number] += 1
+            self.values[key] = (counts, total + value)
+
+    def samples(self):
+        lines = []
+
+        with self.lock:
+            for key, (counts, total) in sorted(self.values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    labels = format_labels(self.labels, key, [('le', format_value(bound))])
+                    lines.append(f'{self.name}_bucket{labels} {count}')
+                lines.append(f'{self.name}_sum{format_labels(self.labels, key)} {format_value(float(total))}')
+                lines.append(f'{self.name}_count{format_labels(self.labels, key)} {counts[-1]}')
+
+        return lines
+
+
+class Registry:
+    """Set of metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=(), function=None):
+        return self.register(Gauge(name, help, labels, function))
+
+    def histogram(self, name, help, labels=(), buckets=job_buckets):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+
+        body = self.server.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(registry, host='127.0.0.1', port=9464):
+    """
+    Serve the registry on http://host:port/metrics from a daemon thread
+
+    Returns:
+        ThreadingHTTPServer: Running server, port 0 picks a free port, see server.server_address
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def directory_size(path):
+    total = 0
+
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+
+    return total
+
+
+class AppMetrics:
+    """
+    Metrics of the web app
+
+    Jobs are recorded by the app as they finish. BrandMeister API calls and errors are
+    taken from the run summary every zone.py job writes, queue depth and disk use are
+    read when the endpoint is scraped.
+    """
+
+    def __init__(self, controller=None, output_root='.'):
+        self.registry = Registry()
+        self.output_root = output_root
+        registry = self.registry
+
+        self.jobs = registry.counter('motobm_jobs_total', 'Generation jobs by mode and outcome.',
+                                     ('mode', 'status'))
+        self.job_seconds = registry.histogram('motobm_job_duration_seconds',
+                                              'Run time of generation jobs after admission.', ('mode',))
+        self.queue_seconds = registry.histogram('motobm_job_queue_seconds',
+                                                'Time generation jobs waited for admission.', ('mode',))
+        self.repeaters = registry.counter('motobm_repeaters_total', 'Repeaters selected by generation jobs.',
+                                          ('mode',))
+        self.zones = registry.counter('motobm_zones_total', 'Zones written by generation jobs.', ('mode',))
+        self.job_errors = registry.counter('motobm_job_errors_total',
+                                           'Errors reported by generation jobs that still finished.', ('mode',))
+        self.api_calls = registry.counter('motobm_api_calls_total',
+                                          'BrandMeister API calls of generation jobs by endpoint and result, '
+                                          'result is fetched, cached, coalesced, throttled or error.', ('endpoint', 'result'))
+
+        if controller is not None:
+            registry.gauge('motobm_jobs_running', 'Generation jobs running now.',
+                           function=lambda: controller.status()['running'])
+            registry.gauge('motobm_jobs_queued', 'Generation jobs waiting for admission.',
+                           function=lambda: controller.status()['queued'])
+            registry.gauge('motobm_jobs_max', 'Generation jobs allowed to run at the same time.',
+                           function=lambda: controller.status()['max_jobs'])
+
+        registry.gauge('motobm_output_disk_bytes', 'Disk space used by output_* directories.',
+                       function=self.output_disk_bytes)
+
+    def output_disk_bytes(self):
+        return sum(directory_size(os.path.join(self.output_root, name)) for name in os.listdir(self.output_root)
+                   if name.startswith('output_') and os.path.isdir(os.path.join(self.output_root, name)))
+
+    def record_job(self, mode, status, queue_seconds=None, job_seconds=None, run_summary=None):
+        """
+        Record a finished, failed or rejected job
+
+        Args:
+            mode (str): "standard" or "talkgroup"
+            status (str): "ok", "failed", "rejected" or "precomputed" (served from a pack)
+            queue_seconds (float): Time waited for admission, None if the job was never queued
+            job_seconds (float): Run time of zone.py, None if it did not run
+            run_summary (dict): Run summary written by zone.py --format json
+        """
+        self.jobs.inc(mode=mode, status=status)
+
+        if queue_seconds is not None:
+            self.queue_seconds.observe(queue_seconds, mode=mode)
+        if job_seconds is not None:
+            self.job_seconds.observe(job_seconds, mode=mode)
+
+        if run_summary is None:
+            return
+
+        self.repeaters.inc(run_summary.get('repeaters', 0), mode=mode)
+        self.zones.inc(len(run_summary.get('zones', [])), mode=mode)
+        self.job_errors.inc(len(run_summary.get('errors', [])), mode=mode)
+
+        for endpoint, results in run_summary.get('api', {}).get('endpoints', {}).items():
+            for result, count in results.items():
+                self.api_calls.inc(count, endpoint=endpoint, result=result)
+
+
+def from_environment(controller=None):
+    """
+    App metrics served on $MOTOBM_METRICS_HOST:$MOTOBM_METRICS_PORT
+
+    Defaults to 127.0.0.1:9464. Setting MOTOBM_METRICS_PORT to an empty value keeps the
+    metrics in memory without serving them.
+    """
+    app_metrics = AppMetrics(controller)
+    port = os.environ.get('MOTOBM_METRICS_PORT', '9464')
+
+    if port:
+        try:
+            start_server(app_metrics.registry, os.environ.get('MOTOBM_METRICS_HOST', '127.0.0.1'), int(port))
+        except OSError as e:
+            # Another app process already serves the port
+            print(f'Metrics endpoint not started: {e}')
+
+    return app_metrics
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from zone import BANDS
+
+
+parser = argparse.ArgumentParser(description='Generate ready to serve Standard Mode zone packs for every MCC and '
+                                             'band in BM.json.')
+
+parser.add_argument('-d', '--packs', default='packs', help='Directory the packs and index.json are written to. '
+                                                           'Default is "packs".')
+parser.add_argument('-b', '--bands', default='vhf,uhf', help='Comma separated bands. Defaults to "vhf,uhf".')
+parser.add_argument('-p', '--power', default=10, type=int,
+                    help='Minimum power in watts of the packs made with -p. Defaults to 10 like the web app.')
+parser.add_argument('-j', '--jobs', default=os.cpu_count() or 1, type=int,
+                    help='zone.py runs at the same time. Defaults to the number of CPU cores.')
+parser.add_argument('-f', '--force', action='store_true', help='Download BM.json again before generating.')
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+bm_file = 'BM.json'
+index_file = 'index.json'
+# Zone name the packs are generated with, replaced by the name the user asks for when a pack is served
+placeholder = '__ZONE_NAME__'
+# Zone capacity of the packs, the web app default
+zone_capacity = 160
+
+
+def pack_key(mcc, band, six, power):
+    """Name of the pack for an MCC, band and the -6 and -p options, power is None without -p"""
+    return f'{mcc}_{band}' + ('_6' if six else '') + (f'_p{power}' if power is not None else '')
+
+
+def find_mccs(file_name, bands):
+    """MCCs with at least one device in each band, the first three digits of the device ID"""
+    with open(file_name, 'r') as file:
+        devices = json.load(file)
+
+    mccs = {band: set() for band in bands}
+
+    for item in devices:
+        key = str(item['id'])
+        try:
+            rx = float(item['rx'])
+        except (TypeError, ValueError):
+            continue
+
+        for band in bands:
+            low, high = BANDS[band]
+            if len(key) >= 6 and low <= rx <= high:
+                mccs[band].add(key[:3])
+
+    return {band: sorted(values) for band, values in mccs.items()}
+
+
+def build_pack(packs_dir, mcc, band, six, power):
+    """
+    Run zone.py for one pack and zip its zone files with the run summary
+
+    Returns:
+        dict: Index entry of the pack, None if no repeater matched or zone.py failed
+    """
+    key = pack_key(mcc, band, six, power)
+    output_dir = tempfile.mkdtemp(prefix=f'{key}_', dir=packs_dir)
+
+    try:
+        cmd = [sys.executable, 'zone.py', '-n', placeholder, '-b', band, '-t', 'mcc', '-m', mcc,
+               '-zc', str(zone_capacity), '-o', output_dir, '--format', 'json']
+        if six:
+            cmd.append('-6')
+        if power is not None:
+            cmd.extend(['-p', str(power)])
+
+        process = subprocess.run(cmd, cwd=base_dir, capture_output=True, text=True)
+        if process.returncode != 0:
+            print(f'{key}: zone.py failed\n{process.stderr.strip()}')
+            return None
+
+        with open(os.path.join(output_dir, 'run_summary.json'), 'r') as file:
+            run_summary = json.load(file)
+        if not run_summary['repeaters']:
+            return None
+
+        # Write next to the final name and swap, the web app may be serving the old pack
+        zip_name = os.path.join(packs_dir, f'{key}.zip')
+        with zipfile.ZipFile(f'{zip_name}.tmp', 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for name in run_summary['files'] + ['run_summary.json']:
+                zip_file.write(os.path.join(output_dir, name), name)
+        os.replace(f'{zip_name}.tmp', zip_name)
+
+        return {
+            'file': f'{key}.zip',
+            'mcc': mcc,
+            'band': band,
+            'six': six,
+            'power': power,
+            'repeaters': run_summary['repeaters'],
+            'zones': len(run_summary['zones']),
+        }
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def precompute(packs_dir, bands, power, jobs):
+    """Build the packs of every MCC, band and option combination in parallel, then replace index.json"""
+    # zone.py runs in base_dir
+    packs_dir = os.path.abspath(packs_dir)
+    os.makedirs(packs_dir, exist_ok=True)
+    started = time.perf_counter()
+    bm_mtime = os.path.getmtime(os.path.join(base_dir, bm_file))
+
+    work = [(mcc, band, six, pack_power) for band, mccs in find_mccs(os.path.join(base_dir, bm_file), bands).items()
+            for mcc in mccs for six in (False, True) for pack_power in (None, power)]
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        entries = list(executor.map(lambda args: build_pack(packs_dir, *args), work))
+
+    packs = {pack_key(*args): entry for args, entry in zip(work, entries) if entry}
+    index = {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        # Packs only match the BM.json they were made from
+        'bm_mtime': bm_mtime,
+        'placeholder': placeholder,
+        'zone_capacity': zone_capacity,
+        'packs': packs,
+    }
+
+    temp_file = os.path.join(packs_dir, f'{index_file}.tmp')
+    with open(temp_file, 'w') as file:
+        json.dump(index, file, indent=1)
+    os.replace(temp_file, os.path.join(packs_dir, index_file))
+
+    # Packs of MCCs which no longer have repeaters
+    kept = {entry['file'] for entry in packs.values()}
+    for name in os.listdir(packs_dir):
+        if name.endswith('.zip') and name not in kept:
+            os.remove(os.path.join(packs_dir, name))
+
+    print(f'{len(packs)} packs of {len(work)} combinations in {time.perf_counter() - started:.1f}s')
+
+
+def find_pack(packs_dir, mcc, band, six, power):
+    """
+    Pack for a Standard Mode request, if one was made from the current BM.json
+
+    Args:
+        packs_dir (str): Directory with index.json
+        mcc (str): Three digit MCC
+        band (str): Band name
+        six (bool): Only 6 digit IDs
+        power (int): Minimum power with -p, None without
+
+    Returns:
+        str: Path of the pack ZIP, None if there is none
+    """
+    try:
+        with open(os.path.join(packs_dir, index_file), 'r') as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    bm_name = os.path.join(base_dir, bm_file)
+    if not os.path.exists(bm_name) or index['bm_mtime'] != os.path.getmtime(bm_name):
+        return None
+
+    entry = index['packs'].get(pack_key(mcc, band, six, power))
+    if entry is None:
+        return None
+
+    return os.path.join(packs_dir, entry['file'])
+
+
+def unpack(zip_name, zone_name, output_dir):
+    """
+    Write the files of a pack to output_dir with the placeholder replaced by zone_name
+
+    Returns:
+        dict: Run summary of the pack for the new zone name
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    with zipfile.ZipFile(zip_name, 'r') as zip_file:
+        for name in zip_file.namelist():
+            # zone.py writes the name into XML as it is, the run summary needs it as a JSON string
+            value = json.dumps(zone_name)[1:-1] if name.endswith('.json') else zone_name
+            content = zip_file.read(name).decode().replace(placeholder, value)
+            with open(os.path.join(output_dir, name.replace(placeholder, zone_name)), 'w') as file:
+                file.write(content)
+
+    with open(os.path.join(output_dir, 'run_summary.json'), 'r') as file:
+        return json.load(file)
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    bands = [band.strip() for band in args.bands.split(',') if band.strip()]
+    unknown = [band for band in bands if band not in BANDS]
+    if unknown or not bands:
+        parser.error(f'argument -b/--bands: use band names from {", ".join(BANDS)}')
+
+    if args.force or not os.path.exists(os.path.join(base_dir, bm_file)):
+        # Warm mode with a prefix no repeater ID starts with only downloads BM.json
+        subprocess.run([sys.executable, 'zone.py', '--warm', '-f', '-b', bands[0], '-t', 'mcc', '-m', '0'],
+                       cwd=base_dir, check=True, capture_output=True)
+
+    precompute(args.packs, bands, args.power, args.jobs)
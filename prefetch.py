@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+
+parser = argparse.ArgumentParser(description='Refresh BM.json and warm the BrandMeister API cache for popular regions.')
+
+parser.add_argument('-c', '--config', default='prefetch.json',
+                    help='Region list with zone.py arguments for each region. Default is "prefetch.json".')
+parser.add_argument('-l', '--log', default='prefetch_log.jsonl',
+                    help='File the timings of every pass are appended to. Default is "prefetch_log.jsonl".')
+parser.add_argument('--loop', type=float, metavar='MINUTES',
+                    help='Keep running and repeat the pass every MINUTES. Without it a single pass is made, '
+                         'which suits a systemd timer.')
+parser.add_argument('--no-refresh', action='store_true',
+                    help='Keep the existing BM.json instead of downloading it again.')
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_regions(config_file):
+    with open(config_file, 'r') as file:
+        regions = json.load(file)['regions']
+
+    if not regions:
+        raise ValueError(f'no regions configured in {config_file}')
+
+    return regions
+
+
+def warm_region(region, refresh):
+    """
+    Run zone.py in warm mode for one region
+
+    Args:
+        region (dict): Region with a name and the zone.py selection arguments
+        refresh (bool): Download BM.json again before selecting repeaters
+
+    Returns:
+        dict: Timings and request counts reported by zone.py
+    """
+    cmd = [sys.executable, 'zone.py', '--warm'] + region['args']
+    if refresh:
+        cmd.append('-f')
+
+    started = time.perf_counter()
+    process = subprocess.run(cmd, cwd=base_dir, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+
+    if process.returncode != 0:
+        return {'name': region['name'], 'error': process.stderr.strip(), 'elapsed': round(elapsed, 3)}
+
+    # The last line of warm mode output is its JSON report
+    report = json.loads(process.stdout.strip().splitlines()[-1])
+    report['name'] = region['name']
+    report['elapsed'] = round(elapsed, 3)
+    # Network time paid here instead of by the first user asking for the region
+    report['warmed'] = round(sum(report['seconds'][stage] for stage in ('download', 'talkgroups', 'names')), 3)
+
+    return report
+
+
+def run_pass(regions, refresh, log_file):
+    started = time.perf_counter()
+    reports = []
+
+    for number, region in enumerate(regions):
+        report = warm_region(region, refresh and number == 0)
+        reports.append(report)
+
+        if 'error' in report:
+            print(f"{report['name']}: failed after {report['elapsed']}s\n{report['error']}")
+        else:
+            print(f"{report['name']}: {report['repeaters']} repeaters, {report['talkgroups']} talkgroups, "
+                  f"{report['requests']} requests, {report['cached']} cached, {report['elapsed']}s")
+
+    entry = {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'elapsed': round(time.perf_counter() - started, 3),
+        'warmed': round(sum(report.get('warmed', 0) for report in reports), 3),
+        'regions': reports,
+    }
+
+    with open(log_file, 'a') as file:
+        file.write(json.dumps(entry) + '\n')
+
+    print(f"Pass finished in {entry['elapsed']}s, {entry['warmed']}s of network time warmed")
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    try:
+        regions = load_regions(args.config)
+    except (OSError, ValueError, KeyError) as e:
+        parser.error(f'cannot read regions: {e}')
+
+    while True:
+        run_pass(regions, not args.no_refresh, args.log)
+
+        if not args.loop:
+            break
+
+        time.sleep(args.loop * 60)
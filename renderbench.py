@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+parser = argparse.ArgumentParser(description='Measure how talkgroup mode zone rendering scales with '
+                                             'zone.py --render-workers on synthetic repeaters with a warm cache.')
+
+parser.add_argument('-n', '--repeaters', default=10000, type=int,
+                    help='Number of synthetic repeaters, each gets its own zone. Defaults to 10000.')
+parser.add_argument('-t', '--talkgroups', default=24, type=int,
+                    help='Talkgroups on every repeater. Defaults to 24.')
+parser.add_argument('-w', '--max-workers', default=os.cpu_count() or 1, type=int,
+                    help='Highest number of render workers measured, every count from 1 is run. '
+                         'Defaults to the number of CPU cores.')
+parser.add_argument('-r', '--repeat', default=3, type=int,
+                    help='Runs per worker count, the fastest one is reported. Defaults to 3.')
+parser.add_argument('--format', choices=['text', 'json', 'quiet'], default='json',
+                    help='zone.py --format of the runs, "text" also formats a table per zone. Defaults to "json".')
+parser.add_argument('--workdir', help='Directory runs happen in. Defaults to a temporary directory removed afterwards.')
+parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+# Repeater IDs of no real country, BM.json and the cache hold nothing else
+prefix = '999'
+# Never contacted, every API response comes from the cache
+api_url = 'http://127.0.0.1:9/v2'
+
+
+def prepare_workdir(workdir, repeaters, talkgroups):
+    """Write a BM.json of synthetic repeaters and cache their talkgroups and talkgroup names"""
+    for name in ('zone.py', 'contacts.py', 'contact_template.csv', 'custom-values.xml'):
+        shutil.copy(os.path.join(base_dir, name), workdir)
+
+    cache_dir = os.path.join(workdir, 'cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    rnd = random.Random(1)
+    devices = []
+    names = set()
+
+    for number in range(repeaters):
+        repeater_id = int(f'{prefix}{number:04d}')
+        devices.append({'id': repeater_id, 'callsign': f'ZZ{number}', 'city': f'Town {number}, Region',
+                        'rx': f'{439 + number % 100 / 1000:.4f}', 'tx': f'{431 + number % 100 / 1000:.4f}',
+                        'colorcode': number % 16, 'lat': 50 + number % 90 / 10, 'lng': 10 + number % 70 / 10,
+                        'pep': 50, 'last_seen': '2026-01-01 00:00:00'})
+
+        channels = []
+        for slot in range(talkgroups):
+            tg_id = rnd.randint(1, 2000) * 10 + 1
+            names.add(tg_id)
+            channels.append({'talkgroup': tg_id, 'slot': 1 + slot % 2, 'repeaterid': repeater_id})
+        with open(os.path.join(cache_dir, f'device_{repeater_id}_talkgroup.json'), 'w') as file:
+            json.dump(channels, file)
+
+    for tg_id in names:
+        with open(os.path.join(cache_dir, f'talkgroup_{tg_id}.json'), 'w') as file:
+            json.dump({'ID': tg_id, 'Name': f'Talkgroup {tg_id}'}, file)
+
+    with open(os.path.join(workdir, 'BM.json'), 'w') as file:
+        json.dump(devices, file)
+
+
+def digest(output_dir):
+    """Hash of every file written by a run, to check that runs with more workers write the same files"""
+    sha = hashlib.sha256()
+
+    for name in sorted(os.listdir(output_dir)):
+        sha.update(name.encode())
+        with open(os.path.join(output_dir, name), 'rb') as file:
+            sha.update(file.read())
+
+    return sha.hexdigest()
+
+
+def run(workdir, workers, output_format):
+    output_dir = f'output_{workers}'
+    shutil.rmtree(os.path.join(workdir, output_dir), ignore_errors=True)
+    cmd = [sys.executable, 'zone.py', '-b', 'uhf', '-t', 'mcc', '-m', prefix, '-tg', '-c', '-o', output_dir,
+           '--format', output_format, '--api-url', api_url, '--render-workers', str(workers)]
+
+    start = time.monotonic()
+    process = subprocess.run(cmd, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    seconds = time.monotonic() - start
+    if process.returncode != 0:
+        raise RuntimeError(f'zone.py --render-workers {workers} failed: {process.stderr.strip()}')
+
+    return seconds, digest(os.path.join(workdir, output_dir))
+
+
+def benchmark(workdir, max_workers, repeat, output_format):
+    """
+    Run zone.py with 1 to max_workers render workers
+
+    Returns:
+        list: Fastest run time, speedup over one worker and whether the output matched one worker's, per worker count
+    """
+    results = []
+
+    for workers in range(1, max_workers + 1):
+        timings = []
+        for attempt in range(repeat):
+            seconds, output = run(workdir, workers, output_format)
+            timings.append(seconds)
+
+        seconds = min(timings)
+        if workers == 1:
+            single, expected = seconds, output
+        results.append({'workers': workers, 'seconds': round(seconds, 2), 'speedup': round(single / seconds, 2),
+                        'efficiency': round(single / seconds / workers, 2), 'identical': output == expected})
+
+    return results
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='motobm_render_')
+    os.makedirs(workdir, exist_ok=True)
+
+    try:
+        prepare_workdir(workdir, args.repeaters, args.talkgroups)
+        results = benchmark(workdir, args.max_workers, args.repeat, args.format)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'repeaters': args.repeaters, 'talkgroups': args.talkgroups, 'format': args.format,
+              'cpu_count': os.cpu_count(), 'runs': results}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{args.repeaters} zones of {args.talkgroups} channels, --format {args.format}, "
+              f"{report['cpu_count']} CPU cores")
+        for result in results:
+            print(f"{result['workers']:3} workers {result['seconds']:8.2f}s  speedup {result['speedup']:5.2f}  "
+                  f"efficiency {result['efficiency']:4.2f}  {'same output' if result['identical'] else 'OUTPUT DIFFERS'}")
@@ -0,0 +1,24 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import admission
+import zone
+
+
+class EstimateCostTest(unittest.TestCase):
+    def test_mcc_range(self):
+        self.assertEqual(admission.estimate_cost(['zone.py', '-t', 'mcc', '-m', '310-316', '-tg']), 5 * 7 * 20)
+        self.assertEqual(admission.estimate_cost(['zone.py', '-t', 'mcc', '-m=262', '-tg']), 5 * 20)
+
+    def test_reversed_mcc_range(self):
+        self.assertEqual(admission.estimate_cost(['zone.py', '-t', 'mcc', '-m', '316-310', '-tg']), 5 * 20)
+        self.assertEqual(admission.estimate_cost(['zone.py', '-t', 'mcc', '-m', '316-310']), 2)
+        with self.assertRaisesRegex(ValueError, 'invalid MCC range'):
+            zone.parse_mcc('316-310')
+
+
+if __name__ == '__main__':
+    unittest.main()
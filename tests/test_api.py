@@ -0,0 +1,80 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import admission
+import api
+import metrics
+import precompute
+
+
+class FileLinkTest(unittest.TestCase):
+    def setUp(self):
+        controller = admission.AdmissionController(1, 1)
+        self.service = api.JobService(controller, metrics.AppMetrics(controller))
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir, ignore_errors=True)
+
+        job = api.Job('job1', 'test', ['zone.py', '-o', self.output_dir], self.output_dir)
+        job.returncode, job.finished = 0, '2026-01-01T00:00:00'
+        self.service.jobs[job.id] = job
+
+        self.server = api.make_server(self.service, '127.0.0.1', 0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def get(self, path):
+        with urllib.request.urlopen(f'http://127.0.0.1:{self.server.server_address[1]}{path}') as response:
+            return response.read()
+
+    def test_name_with_space(self):
+        with open(os.path.join(self.output_dir, 'My Zone #1.xml'), 'w') as file:
+            file.write('<zone/>')
+
+        links = json.loads(self.get('/jobs/job1'))['links']['files']
+
+        self.assertEqual(links['My Zone #1.xml'], '/jobs/job1/files/My%20Zone%20%231.xml')
+        self.assertEqual(self.get(links['My Zone #1.xml']), b'<zone/>')
+
+    def test_file_outside_output_dir(self):
+        outside = os.path.join(os.path.dirname(self.output_dir), f'{os.path.basename(self.output_dir)}.txt')
+        with open(outside, 'w') as file:
+            file.write('secret')
+        self.addCleanup(os.remove, outside)
+        name = f'../{os.path.basename(outside)}'
+        with open(os.path.join(self.output_dir, 'run_summary.json'), 'w') as file:
+            json.dump({'files': [name]}, file)
+
+        self.assertEqual(self.service.get('job1').files(), [])
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            self.get(f'/jobs/job1/files/{quote(name, safe="")}')
+        self.assertEqual(context.exception.code, 404)
+
+
+class BuildCommandTest(unittest.TestCase):
+    def test_name_leaving_output_dir(self):
+        for name in ('../../x', 'a/b', 'a\\b', '..'):
+            with self.assertRaisesRegex(ValueError, 'path separators'):
+                api.build_command({'name': name, 'band': 'uhf', 'type': 'mcc', 'mcc': '262'}, 'output_api_1')
+
+        self.assertIn('-n=My Zone', api.build_command({'name': 'My Zone'}, 'output_api_1'))
+
+
+class FindPackTest(unittest.TestCase):
+    def test_power_without_minimum(self):
+        self.assertNotEqual(precompute.pack_key('246', 'vhf', False, 0), precompute.pack_key('246', 'vhf', False, None))
+        self.assertEqual(precompute.pack_key('246', 'vhf', False, 0), '246_vhf_p0')
+
+
+if __name__ == '__main__':
+    unittest.main()
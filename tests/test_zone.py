@@ -0,0 +1,168 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import zone
+
+
+def device(repeater_id, callsign, days):
+    seen = datetime.now(timezone.utc) - timedelta(days=days)
+    return {'id': repeater_id, 'callsign': callsign, 'city': 'Town', 'rx': '439.5000', 'tx': '431.9000',
+            'colorcode': 1, 'lat': 50.0, 'lng': 10.0, 'pep': 50, 'last_seen': seen.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+class ParseMccTest(unittest.TestCase):
+    def test_range(self):
+        self.assertEqual(zone.parse_mcc('310-316'), ['310', '311', '312', '313', '314', '315', '316'])
+        self.assertEqual(zone.parse_mcc('300-399'), ['3'])
+        self.assertEqual(zone.parse_mcc('000-999'), [str(digit) for digit in range(10)])
+        self.assertEqual(zone.parse_mcc('3100000-3100999'), ['3100'])
+        self.assertEqual(zone.parse_mcc('0999-1000'), ['0999', '1000'])
+
+    def test_prefixes_match_the_range(self):
+        prefixes = zone.parse_mcc('128-871')
+        for number in range(1000):
+            expected = 128 <= number <= 871
+            self.assertEqual(any(f'{number:03d}'.startswith(prefix) for prefix in prefixes), expected, number)
+
+    def test_bounds_of_different_length(self):
+        with self.assertRaisesRegex(ValueError, 'same number of digits'):
+            zone.parse_mcc('1-12')
+
+    def test_wide_range(self):
+        with self.assertRaisesRegex(ValueError, 'more than 1000'):
+            zone.parse_mcc('1000000-9999999')
+        with self.assertRaisesRegex(ValueError, 'more than 1000'):
+            zone.parse_mcc('310000-311000')
+
+
+class FilterListTest(unittest.TestCase):
+    def setUp(self):
+        self.table = zone.RepeaterTable(zone.Repeater.from_device(item) for item in [
+            device(262001, 'DB0AA', 1), device(262002, 'DB0BB', 100), device(246001, 'LY1AA', 1)])
+
+    def options(self, *argv):
+        options = zone.parser.parse_args(['-n', 'T', '-b', 'uhf', '-t', 'mcc', *argv])
+        options.mcc = zone.parse_mcc(options.mcc)
+        return options
+
+    def test_jobs_share_table(self):
+        recent, stale = zone.filter_list(self.table, self.options('-m', '262', '--max-age', '30'))
+        everything, none = zone.filter_list(self.table, self.options('-m', '262'))
+        other, ignored = zone.filter_list(self.table, self.options('-m', '246'))
+
+        self.assertEqual([item.callsign for item in recent], ['DB0AA'])
+        self.assertEqual([item.callsign for item in stale], ['DB0BB'])
+        self.assertEqual([item.callsign for item in everything], ['DB0AA', 'DB0BB'])
+        self.assertEqual(none, [])
+        self.assertEqual([item.callsign for item in other], ['LY1AA'])
+        self.assertIsNot(recent, everything)
+
+
+class ClusterZonesTest(unittest.TestCase):
+    def repeater(self, repeater_id, city, lng):
+        return zone.Repeater(repeater_id, f'DB{repeater_id}', city, '439.5000', '431.9000', 1, 50.0, lng, 50, '')
+
+    def test_aliases_cut_to_the_same_name(self):
+        items = [self.repeater(1, 'Neustadt an der Aisch', 10.0), self.repeater(2, 'Neustadt an der Donau', 20.0),
+                 self.repeater(3, 'Neustadt an der Aisch', 30.0), self.repeater(4, 'Bergen', 40.0)]
+
+        zones, remaining = zone.cluster_zones(items, 1)
+        aliases = [alias for alias, chunk in zones]
+
+        self.assertEqual(len(set(aliases)), 4)
+        self.assertTrue(all(len(alias) <= 16 for alias in aliases))
+        self.assertEqual(aliases, ['Bergen', 'Neustadt an d #1', 'Neustadt an d #2', 'Neustadt an d #3'])
+
+    def test_path_separator_in_city(self):
+        zones, remaining = zone.cluster_zones([self.repeater(1, 'Bozen/Bolzano', 10.0)], 1)
+
+        self.assertEqual(zones[0][0], 'Bozen-Bolzano')
+
+
+class StubApi(BaseHTTPRequestHandler):
+    responses = {
+        '/v2/device/262001/talkgroup': [{'talkgroup': 91, 'slot': 1, 'repeaterid': 262001}],
+        '/v2/talkgroup/91': {'ID': 91, 'Name': 'Worldwide'},
+    }
+
+    def do_GET(self):
+        body = json.dumps(self.responses[self.path]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WarmCacheTest(unittest.TestCase):
+    def setUp(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubApi)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.api_url = f'http://127.0.0.1:{server.server_address[1]}/v2'
+
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(workdir.name)
+
+        with open('BM.json', 'w') as file:
+            json.dump([device(262001, 'DB0AA', 1)], file)
+
+    def test_refreshes_fresh_entries(self):
+        os.makedirs('cache')
+        for name in ('device_262001_talkgroup.json', 'talkgroup_91.json'):
+            with open(os.path.join('cache', name), 'w') as file:
+                json.dump({'stale': True}, file)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            zone.main(['--warm', '-b', 'uhf', '-t', 'mcc', '-m', '262', '--api-url', self.api_url])
+
+        with open(os.path.join('cache', 'device_262001_talkgroup.json')) as file:
+            self.assertEqual(json.load(file), StubApi.responses['/v2/device/262001/talkgroup'])
+        with open(os.path.join('cache', 'talkgroup_91.json')) as file:
+            self.assertEqual(json.load(file), StubApi.responses['/v2/talkgroup/91'])
+
+
+class FileLockTest(unittest.TestCase):
+    def test_exclusive_without_leftover(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        file_name = os.path.join(workdir.name, 'cache', 'entry.json')
+        holders = []
+        overlaps = []
+
+        def hold():
+            for attempt in range(50):
+                with zone.file_lock(file_name):
+                    holders.append(1)
+                    if len(holders) > 1:
+                        overlaps.append(len(holders))
+                    holders.pop()
+
+        threads = [threading.Thread(target=hold) for number in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(overlaps, [])
+        self.assertEqual(os.listdir(os.path.dirname(file_name)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,14 +2,16 @@
 
 import argparse
 import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
 from os.path import exists
-from tabulate import tabulate
-
-import geopy.distance
-import maidenhead
-import mobile_codes
-import requests
-import urllib3
+from typing import NamedTuple
 
 
 parser = argparse.ArgumentParser(description='Generate MOTOTRBO zone files from BrandMeister.')
@@ -17,13 +19,18 @@ parser = argparse.ArgumentParser(description='Generate MOTOTRBO zone files from
 parser.add_argument('-f', '--force', action='store_true',
                     help='Forcibly download repeater list even if it exists locally.')
 parser.add_argument('-n', '--name', required=False, help='Zone name. Choose it freely on your own. Required unless using -tg argument.')
-parser.add_argument('-b', '--band', choices=['vhf', 'uhf'], required=True, help='Repeater band.')
+parser.add_argument('-b', '--band', required=True,
+                    help='Repeater band: vhf (136-174 MHz), uhf (400-480 MHz), 2m (144-148 MHz), '
+                         '1.25m (222-225 MHz), 70cm (420-450 MHz) or a custom range in MHz like 430-440.')
 
 parser.add_argument('-t', '--type', choices=['mcc', 'qth', 'gps'], required=True,
                     help='Select repeaters by MCC code, QTH locator index or GPS coordinates.')
 
 parser.add_argument('-m', '--mcc', help='First repeater ID digits, usually a 3 digits MCC. '
-                                        'You can also use a two letter country code instead.')
+                                        'You can also use a two letter country code instead. '
+                                        'Several values can be comma separated and numeric ranges are allowed, '
+                                        'e.g. "US,CA,MX" or "310-316". Both ends of a range need the same number '
+                                        'of digits and it may span up to 1000 numbers.')
 parser.add_argument('-q', '--qth', help='QTH locator index like KO26BX.')
 
 parser.add_argument('-r', '--radius', default=100, type=int,
@@ -40,36 +47,282 @@ parser.add_argument('-zc', '--zone-capacity', default=160, type=int,
 parser.add_argument('-c', '--customize', action='store_true',
                     help='Include customized values for each channel.')
 parser.add_argument('-cs', '--callsign', help='Only list callsigns containing specified string like a region number.')
+parser.add_argument('--max-age', type=float, metavar='DAYS',
+                    help='Only list repeaters seen by BrandMeister within the last DAYS days. Repeaters without '
+                         'a last seen time are skipped too.')
 parser.add_argument('-tg', '--talkgroups', action='store_true',
                     help='Create channels only for active talkgroups on repeaters (no channels with blank contact ID).')
+parser.add_argument('--contacts', metavar='TEMPLATE',
+                    help='Contact template for talkgroup mode, a CPS2 contact export or its index stored by the web '
+                         'app. Without it a template uploaded to contact_uploads or contact_template.csv is used.')
 parser.add_argument('-o', '--output', default='output',
                     help='Output directory for generated files. Default is "output".')
 parser.add_argument('--city-prefix', action='store_true',
                     help='Prefix channel names with 3-character city abbreviation (e.g. "NYC.TG123")')
+parser.add_argument('--api-url', default=os.environ.get('BM_API_URL', 'https://api.brandmeister.network/v2'),
+                    help='BrandMeister API base URL, e.g. a local bm_stub.py server. '
+                         'Defaults to $BM_API_URL or https://api.brandmeister.network/v2.')
+parser.add_argument('--cache-ttl', default=24, type=float,
+                    help='Hours BrandMeister API responses are reused from the cache directory. '
+                         'Defaults to 24, use 0 to disable the cache.')
+parser.add_argument('--fetch-workers', default=4, type=int,
+                    help='Repeaters whose talkgroups are fetched from BrandMeister API at the same time in '
+                         'talkgroup mode. Defaults to 4.')
+parser.add_argument('--render-workers', default=1, type=int,
+                    help='Processes formatting the zones of a talkgroup mode run at the same time, for large '
+                         'selections with cached talkgroups. Defaults to 1, formatting in the main process.')
+parser.add_argument('--resume', action='store_true',
+                    help='Continue an interrupted talkgroup run from checkpoint.jsonl in the output directory. '
+                         'Repeaters and talkgroup names it already resolved are not requested again, repeaters '
+                         'which failed are retried.')
+parser.add_argument('--warm', action='store_true',
+                    help='Only fetch talkgroups and talkgroup names of the selected repeaters into the cache, '
+                         'fresh entries included, then print timings as JSON. Used by prefetch.py.')
+parser.add_argument('--dry-run', action='store_true',
+                    help='Only estimate the job from the local BM.json and cache without network access or writing '
+                         'files: matching repeaters, zones, channels, API calls and run time.')
+parser.add_argument('--memprofile', action='store_true',
+                    help='Trace memory allocations and report peak and retained memory of each stage with the '
+                         'allocation sites growing most. Written to memory_profile.json in the output directory.')
+parser.add_argument('--format', choices=['text', 'json', 'jsonl', 'quiet'], default='text',
+                    help='How found repeaters are reported. "text" prints a table per zone, "json" and "jsonl" '
+                         'write a run summary with zones, channels and errors to run_summary.json(l) in the '
+                         'output directory, "quiet" reports nothing. Defaults to "text".')
+parser.add_argument('--delta', metavar='EXPORT',
+                    help='Zone XML previously exported from CPS2. Instead of full zone files only channels which '
+                         'are new or changed compared to it are written to delta.xml, with removed ones listed '
+                         'in delta_summary.json.')
+parser.add_argument('--targets', default='cps2',
+                    help='Comma separated output formats written from the same run: "cps2" zone XML and '
+                         'contacts.csv, "csv" one channels.csv with every channel for other programming software, '
+                         '"tglist" talkgroups.csv listing the talkgroups found with -tg. Defaults to "cps2".')
+parser.add_argument('--combine', nargs='?', const=1, type=int, metavar='SHARDS',
+                    help='Write all zones into one XML file instead of one file per zone. '
+                         'Optional value splits the zones into that many files.')
+parser.add_argument('--cluster', action='store_true',
+                    help='Group repeaters into geographically compact zones of at most --zone-capacity repeaters '
+                         'named after their most common city, instead of filling zones in callsign order. '
+                         'Standard mode only.')
+
+# Parsed by parse_arguments() when zone.py runs, so importing it stays cheap
+args = None
+
+
+# Frequency ranges in MHz, bounds included
+BANDS = {
+    'vhf': (136.0, 174.0),
+    'uhf': (400.0, 480.0),
+    '2m': (144.0, 148.0),
+    '1.25m': (222.0, 225.0),
+    '70cm': (420.0, 450.0),
+}
+
+# Output formats of --targets
+TARGETS = ['cps2', 'csv', 'tglist']
+
+# Same mean earth radius geopy uses for great circle distances
+EARTH_RADIUS = 6371.009
+
+bm_api = None
+bm_url = None
+bm_file = 'BM.json'
+cache_dir = 'cache'
+api_retries = 3
+api_stats = {'requests': 0, 'cached': 0, 'coalesced': 0, 'throttled': 0, 'endpoints': {}}
+stats_lock = threading.Lock()
+# Talkgroup name requests by talkgroup ID, shared by the talkgroup mode worker threads
+talkgroup_names = {}
+names_lock = threading.Lock()
+# Progress of a talkgroup run appended to checkpoint.jsonl in the output directory, see --resume
+checkpoint_file = 'checkpoint.jsonl'
+checkpoint_path = None
+checkpoint = {'talkgroups': {}, 'names': {}, 'failed': {}, 'zones': set(), 'contacts': None}
+checkpoint_lock = threading.Lock()
+failed_repeaters = []
+# Typical times of BrandMeister API requests and of downloading BM.json, used by --dry-run estimates
+estimated_request_seconds = 0.4
+estimated_download_seconds = 15
+# Devices parsed from BM.json before the selection filters are applied to them
+stream_batch_size = 5000
+# Most numbers one -m range may span
+max_mcc_range = 1000
+# Talkgroup mode zones sent to a render worker at once, and batches each worker may have queued
+render_batch_size = 50
+render_queue_depth = 2
+filtered_list = []
+renderers = []
+pending_zones = []
+delta_zones = []
+# Channel fields identifying a channel when comparing with a CPS2 export, the contact only exists in talkgroup mode
+delta_key_fields = ['CP_TXFREQ', 'CP_RXFREQ', 'CP_COLORCODE', 'CP_SLTASSGMNT', 'CP_UKPPERS']
+summary_fields = ['callsign', 'rx', 'tx', 'cc', 'city', 'last_seen', 'url']
+summary = {'zones': [], 'channels': [], 'errors': [], 'files': []}
+# Stages measured by --memprofile and the allocation sites listed for each of them
+memory_stages = []
+memory_top_sites = 10
+# Highest traced memory of the stages measured so far, each stage resets the tracemalloc peak
+memory_peak = 0
+custom_file = 'custom-values.xml'
+custom_values = ''
+
+
+def band_range(band):
+    """
+    Resolve a band name or a "LOW-HIGH" range in MHz
 
+    Args:
+        band (str): Band name from BANDS or a custom range like "430-440"
 
-args = parser.parse_args()
+    Returns:
+        tuple: Lowest and highest frequency in MHz
+    """
+    if band in BANDS:
+        return BANDS[band]
 
-# Validate that name is provided if not using talkgroups mode
-if not args.name and not args.talkgroups:
-    parser.error("the -n/--name argument is required when not using -tg/--talkgroups")
+    try:
+        low, high = (float(part) for part in band.split('-'))
+    except ValueError:
+        raise ValueError(f'unknown band "{band}", use one of {", ".join(BANDS)} or a range like 430-440')
 
+    if high < low:
+        raise ValueError(f'invalid band range "{band}"')
 
-bm_url = 'https://api.brandmeister.network/v2/device'
-bm_file = 'BM.json'
-filtered_list = []
-output_list = []
-existing = {}
-custom_file = 'custom-values.xml'
-custom_values = ''
+    return low, high
+
+
+def range_prefixes(start, end):
+    """
+    Fewest ID prefixes matching exactly the numbers from start to end
+
+    Aligned blocks like 300-399 become one shorter prefix ("3") instead of a prefix per number.
+
+    Args:
+        start (str): First number of the range
+        end (str): Last number of the range, with as many digits as start
+
+    Returns:
+        list: Prefixes with at least one digit
+    """
+    width = len(start)
+    low, high = int(start), int(end)
+    prefixes = []
+
+    while low <= high:
+        size = 1
+        while size * 10 < 10 ** width and low % (size * 10) == 0 and low + size * 10 - 1 <= high:
+            size *= 10
+        prefixes.append(str(low // size).zfill(width - len(str(size)) + 1))
+        low += size
+
+    return prefixes
+
+
+def parse_mcc(value):
+    """
+    Expand an -m argument into a list of repeater ID prefixes
+
+    Args:
+        value (str): Comma separated MCCs, two letter country codes or numeric ranges like "310-316"
 
-if args.type == 'qth':
-    qth_coords = maidenhead.to_location(args.qth, center=True)
-if args.type == 'gps':
-    qth_coords = (args.lat, args.lon)
+    Returns:
+        list: Sorted ID prefixes, without prefixes already covered by a shorter one
+    """
+    prefixes = set()
+
+    for token in str(value).split(','):
+        token = token.strip()
+        if not token:
+            continue
+
+        if token.isdigit():
+            prefixes.add(token)
+        elif '-' in token and all(part.strip().isdigit() for part in token.split('-', 1)):
+            start, end = (part.strip() for part in token.split('-', 1))
+            if int(end) < int(start):
+                raise ValueError(f'invalid MCC range "{token}"')
+            if len(start) != len(end):
+                raise ValueError(f'MCC range "{token}" needs bounds with the same number of digits')
+            if int(end) - int(start) + 1 > max_mcc_range:
+                raise ValueError(f'MCC range "{token}" spans more than {max_mcc_range} numbers')
+            prefixes.update(range_prefixes(start, end))
+        else:
+            import mobile_codes
+            try:
+                mcc = mobile_codes.alpha2(token)[4]
+            except KeyError:
+                raise ValueError(f'unknown country code "{token}"')
+            prefixes.update(mcc if type(mcc) is list else [mcc])
+
+    result = []
+    for prefix in sorted(prefixes):
+        # Sorted order puts "31" right before "310", so one look back is enough
+        if result and prefix.startswith(result[-1]):
+            continue
+        result.append(prefix)
+
+    return result
+
+
+def parse_arguments(argv=None):
+    """Parse and validate the command line, then set the globals derived from it"""
+    global args
+    global bm_api
+    global bm_url
+
+    args = parser.parse_args(argv)
+
+    # Validate that name is provided if not using talkgroups mode
+    if not args.name and not args.talkgroups and not args.warm and not args.dry_run:
+        parser.error("the -n/--name argument is required when not using -tg/--talkgroups")
+
+    if args.mcc:
+        try:
+            args.mcc = parse_mcc(args.mcc)
+        except ValueError as e:
+            parser.error(f'argument -m/--mcc: {e}')
+
+    try:
+        band_range(args.band)
+    except ValueError as e:
+        parser.error(f'argument -b/--band: {e}')
+
+    if args.contacts and not exists(args.contacts):
+        parser.error(f'argument --contacts: {args.contacts} does not exist')
+
+    if args.delta and not exists(args.delta):
+        parser.error(f'argument --delta: {args.delta} does not exist')
+
+    if args.max_age is not None and args.max_age < 0:
+        parser.error('argument --max-age: number of days must not be negative')
+
+    args.targets = [target.strip() for target in args.targets.split(',') if target.strip()]
+    unknown = [target for target in args.targets if target not in TARGETS]
+    if unknown or not args.targets:
+        parser.error(f'argument --targets: use one or more of {", ".join(TARGETS)}')
+    if 'tglist' in args.targets and not args.talkgroups:
+        parser.error('the tglist target requires -tg/--talkgroups')
+    if args.delta and 'cps2' not in args.targets:
+        parser.error('argument --delta: compares CPS2 zones, add the cps2 target')
+
+    if args.combine is not None and args.combine < 1:
+        parser.error('argument --combine: number of files must be at least 1')
+
+    if args.render_workers < 1:
+        parser.error('argument --render-workers: number of processes must be at least 1')
+
+    if args.resume and not args.talkgroups:
+        parser.error('argument --resume: only talkgroup mode runs keep a checkpoint')
 
-if args.mcc and not str(args.mcc).isdigit():
-    args.mcc = mobile_codes.alpha2(args.mcc)[4]
+    if args.cluster and args.talkgroups:
+        parser.error('argument --cluster: talkgroup mode already makes one zone per repeater')
+
+    if args.type == 'mcc' and not args.mcc:
+        parser.error('the -m/--mcc argument is required when using -t mcc')
+
+    bm_api = args.api_url.rstrip('/')
+    bm_url = f'{bm_api}/device'
+
+    return args
 
 
 def check_custom():
@@ -86,166 +339,599 @@ def check_custom():
 
 def download_file():
     if not exists(bm_file) or args.force:
-        print(f'Downloading from {bm_url}')
+        requested = time.time()
 
-        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        with file_lock(bm_file):
+            # Another run downloaded it while this one waited for the lock
+            if exists(bm_file) and os.path.getmtime(bm_file) >= requested:
+                print(f'Using {bm_file} just downloaded by another run')
+                return
 
-        response = requests.get(bm_url, verify=False)
-        response.raise_for_status()
+            download_devices()
 
-        with open(bm_file, 'wb') as file:
-            file.write(response.content)
 
-        print(f'Saved to {bm_file}')
+def download_devices():
+    print(f'Downloading from {bm_url}')
 
+    response = api_request(bm_url)
 
-def check_distance(loc1, loc2):
-    return geopy.distance.great_circle(loc1, loc2).km
+    # Store devices ordered by ID string so building the prefix index is a linear pass
+    devices = sorted(response.json(), key=lambda k: str(k['id']))
 
+    # Replace the file atomically, other runs may be reading it right now
+    temp_file = f'{bm_file}.{os.getpid()}.tmp'
+    with open(temp_file, 'w') as file:
+        json.dump(devices, file)
+    os.replace(temp_file, bm_file)
 
-def filter_list():
-    global filtered_list
-    global existing
-    global qth_coords
+    print(f'Saved to {bm_file}')
 
-    f = open(bm_file, "r")
 
-    json_list = json.loads(f.read())
-    sorted_list = sorted(json_list, key=lambda k: (k['callsign'], int(k["id"])))
+@contextmanager
+def file_lock(file_name):
+    """
+    Hold an exclusive lock shared by all zone.py processes for file_name
 
-    for item in sorted_list:
-        if not ((args.band == 'vhf' and item['rx'].startswith('1')) or (
-                args.band == 'uhf' and item['rx'].startswith('4'))):
-            continue
+    Runs needing the same file wait for the one fetching it and can then reuse its result
+    instead of asking the API again. The lock file is removed again on release. Without
+    fcntl (Windows) nothing is locked.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    directory = os.path.dirname(file_name)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+
+    lock_name = f'{file_name}.lock'
+    while True:
+        lock = open(lock_name, 'a')
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        # The holder before removed the lock file, a run waiting on that file has to lock a new one
+        try:
+            if os.stat(lock_name).st_ino == os.fstat(lock.fileno()).st_ino:
+                break
+        except FileNotFoundError:
+            pass
+        lock.close()
 
-        if args.type == 'mcc':
-            is_starts = False
+    try:
+        yield
+    finally:
+        # Removed while still held, so no lock file is left behind per cache entry
+        os.remove(lock_name)
+        lock.close()
 
-            if type(args.mcc) is list:
-                for mcc in args.mcc:
-                    if str(item['id']).startswith(mcc):
-                        is_starts = True
-            else:
-                if str(item['id']).startswith(args.mcc):
-                    is_starts = True
 
-            if not is_starts:
-                continue
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
 
-        if (args.type == 'qth' or args.type == 'gps') and check_distance(qth_coords,
-                                                                         (item['lat'], item['lng'])) > args.radius:
-            continue
 
-        if args.pep:
-            # Skip if power is not defined or is zero
-            if not str(item['pep']).isdigit() or str(item['pep']) == '0':
-                continue
-            # Skip if power is less than specified minimum (if provided)
-            if args.pep != '0' and int(item['pep']) < int(args.pep):
+def to_timestamp(value):
+    """Seconds since the epoch of a BrandMeister time like "2025-05-13 12:00:00" in UTC, NaN if it is missing"""
+    try:
+        seen = datetime.fromisoformat(str(value))
+    except ValueError:
+        return float('nan')
+
+    if seen.tzinfo is None:
+        seen = seen.replace(tzinfo=timezone.utc)
+
+    return seen.timestamp()
+
+
+class Repeater(NamedTuple):
+    """
+    Immutable device record with only the BM.json fields zone.py uses
+
+    Records are never changed once parsed, so one loaded list can be selected from by
+    many jobs at the same time. What a job derives from a record lives in a JobRepeater.
+    """
+
+    id: int
+    callsign: str
+    city: str
+    rx: str
+    tx: str
+    colorcode: int
+    lat: float
+    lng: float
+    # Undefined power is stored as 0, which no power filter accepts
+    pep: int
+    last_seen: str
+
+    @classmethod
+    def from_device(cls, item):
+        pep = item.get('pep')
+        return cls(item['id'], str(item.get('callsign') or ''), item.get('city') or '', item.get('rx'),
+                   item.get('tx'), item.get('colorcode'), to_float(item.get('lat')), to_float(item.get('lng')),
+                   int(pep) if str(pep).isdigit() else 0, item.get('last_seen'))
+
+
+class JobRepeater(NamedTuple):
+    """A repeater selected by one job with the display callsign, turn and channel alias of that job"""
+
+    repeater: Repeater
+    # First word of the callsign, or the ID when it has none
+    callsign: str
+    # Number of the repeater among those of the job sharing its display callsign
+    turn: int
+    alias: str
+
+    @property
+    def id(self):
+        return self.repeater.id
+
+    @property
+    def city(self):
+        return self.repeater.city
+
+    @property
+    def rx(self):
+        return self.repeater.rx
+
+    @property
+    def tx(self):
+        return self.repeater.tx
+
+    @property
+    def colorcode(self):
+        return self.repeater.colorcode
+
+    @property
+    def last_seen(self):
+        return self.repeater.last_seen
+
+    @property
+    def lat(self):
+        return self.repeater.lat
+
+    @property
+    def lng(self):
+        return self.repeater.lng
+
+
+class RepeaterTable:
+    """
+    Column oriented copy of a list of Repeater records
+
+    Every selection filter is evaluated as a boolean mask over whole NumPy columns
+    instead of branching per device. Rows are ordered by the ID rendered as a string,
+    so an ID prefix maps to a contiguous range of rows found by binary search.
+    """
+
+    def __init__(self, repeaters):
+        import numpy as np
+
+        pairs = sorted(((str(item.id), item) for item in repeaters), key=lambda pair: pair[0])
+
+        self.keys = [key for key, item in pairs]
+        self.repeaters = [item for key, item in pairs]
+        self.size = len(self.repeaters)
+
+        self.rx = np.fromiter((to_float(item.rx) for item in self.repeaters), dtype=np.float64, count=self.size)
+        self.lat = np.fromiter((item.lat for item in self.repeaters), dtype=np.float64, count=self.size)
+        self.lng = np.fromiter((item.lng for item in self.repeaters), dtype=np.float64, count=self.size)
+        self.pep = np.fromiter((item.pep for item in self.repeaters), dtype=np.int64, count=self.size)
+        self.id_length = np.fromiter((len(key) for key in self.keys), dtype=np.int16, count=self.size)
+        self.callsign = np.array([item.callsign for item in self.repeaters], dtype=str)
+
+    def all(self):
+        import numpy as np
+        return np.ones(self.size, dtype=bool)
+
+    def band_mask(self, low, high):
+        return (self.rx >= low) & (self.rx <= high)
+
+    def prefix_mask(self, prefixes):
+        import numpy as np
+        mask = np.zeros(self.size, dtype=bool)
+
+        for prefix in prefixes:
+            start = bisect_left(self.keys, prefix)
+            # IDs are all digits, so the first key past the range starts with the next character
+            end = bisect_left(self.keys, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+            mask[start:end] = True
+
+        return mask
+
+    def distance_mask(self, center, radius):
+        import numpy as np
+        lat1, lng1 = np.radians(center[0]), np.radians(center[1])
+        lat2, lng2 = np.radians(self.lat), np.radians(self.lng)
+        delta_lng = lng2 - lng1
+
+        # Great circle formula as used by geopy.distance.great_circle
+        distance = EARTH_RADIUS * np.arctan2(
+            np.sqrt((np.cos(lat2) * np.sin(delta_lng)) ** 2 +
+                    (np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(delta_lng)) ** 2),
+            np.sin(lat1) * np.sin(lat2) + np.cos(lat1) * np.cos(lat2) * np.cos(delta_lng))
+
+        return distance <= radius
+
+    def pep_mask(self, minimum):
+        return (self.pep > 0) & (self.pep >= minimum)
+
+    def six_mask(self):
+        return self.id_length == 6
+
+    def callsign_mask(self, text):
+        import numpy as np
+        return np.char.find(self.callsign, text) >= 0
+
+    def age_mask(self, oldest, mask):
+        """Rows of mask last seen at or after the timestamp oldest, only the rows of mask are parsed"""
+        import numpy as np
+        last_seen = np.full(self.size, np.nan)
+        rows = np.flatnonzero(mask)
+        last_seen[rows] = [to_timestamp(self.repeaters[i].last_seen) for i in rows]
+
+        return mask & (last_seen >= oldest)
+
+    def select(self, mask):
+        import numpy as np
+        return [self.repeaters[i] for i in np.flatnonzero(mask)]
+
+
+def iter_devices(file_name, chunk_size=1 << 20):
+    """
+    Parse the device list incrementally
+
+    BM.json is one JSON array of device objects. Objects are decoded one by one
+    from a buffer refilled in chunks, so the whole document is never held in memory.
+
+    Args:
+        file_name (str): Path to the device list
+        chunk_size (int): Number of characters read at once
+
+    Yields:
+        dict: Device records in file order
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+
+    with open(file_name, 'r') as f:
+        while True:
+            # Skip the opening bracket and separators between objects
+            while position < len(buffer) and buffer[position] in '[, \t\r\n':
+                position += 1
+
+            if position < len(buffer) and buffer[position] == ']':
+                return
+
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    if buffer[position:].strip():
+                        raise
+                    return
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
                 continue
 
-        if args.six and not len(str(item['id'])) == 6:
-            continue
+            yield item
 
-        if args.callsign and (not args.callsign in item['callsign']):
-            continue
 
-        if item['callsign'] == '':
-            item['callsign'] = item['id']
+def search_center(options):
+    """Coordinates the -r radius is measured from, None unless the type is qth or gps"""
+    if options.type == 'qth':
+        import maidenhead
+        return maidenhead.to_location(options.qth, center=True)
+    if options.type == 'gps':
+        return (options.lat, options.lon)
+    return None
+
+
+def selection_mask(table, options):
+    """Combine the masks of all selection filters given in options"""
+    mask = table.band_mask(*band_range(options.band))
+
+    if options.type == 'mcc':
+        mask &= table.prefix_mask(options.mcc)
+
+    if options.type == 'qth' or options.type == 'gps':
+        mask &= table.distance_mask(search_center(options), options.radius)
+
+    if options.pep:
+        mask &= table.pep_mask(int(options.pep))
+
+    if options.six:
+        mask &= table.six_mask()
+
+    if options.callsign:
+        mask &= table.callsign_mask(options.callsign)
+
+    return mask
+
+
+def select_batch(table, options, selected, stale, oldest):
+    """Add the repeaters of a table passing all filters to selected, those only failing --max-age to stale"""
+    mask = selection_mask(table, options)
+
+    if oldest is not None:
+        active = table.age_mask(oldest, mask)
+        stale.extend(table.select(mask & ~active))
+        mask = active
 
-        item['callsign'] = item['callsign'].split()[0]
+    selected.extend(table.select(mask))
 
-        if any((existing['rx'] == item['rx'] and existing['tx'] == item['tx'] and existing['callsign'] == item[
-            'callsign']) for existing in filtered_list):
+
+def unique_repeaters(items, seen):
+    """
+    Repeaters sorted by callsign and ID without repeated frequency and callsign pairs, seen is updated
+
+    Returns:
+        list: Pairs of a repeater and its display callsign
+    """
+    result = []
+
+    for item in sorted(items, key=lambda k: (k.callsign, int(k.id))):
+        callsign = (item.callsign or str(item.id)).split()[0]
+
+        if (item.rx, item.tx, callsign) in seen:
             continue
+        seen.add((item.rx, item.tx, callsign))
+
+        result.append((item, callsign))
+
+    return result
+
+
+def filter_list(table, options):
+    """
+    Select the repeaters of a job, the table is only read so one loaded copy can serve many jobs
+
+    Args:
+        table (RepeaterTable): Loaded devices, BM.json is streamed batch by batch when None
+        options (argparse.Namespace): Parsed zone.py options of the job
+
+    Returns:
+        tuple: JobRepeater views of the selected repeaters, and the repeaters dropped only by --max-age
+    """
+    selected = []
+    stale = []
+    batch = []
+    oldest = time.time() - options.max_age * 86400 if options.max_age is not None else None
+
+    if table is not None:
+        select_batch(table, options, selected, stale, oldest)
+    else:
+        # Apply the selection masks batch by batch while parsing, keeping only the survivors
+        for item in iter_devices(bm_file):
+            batch.append(Repeater.from_device(item))
+            if len(batch) == stream_batch_size:
+                select_batch(RepeaterTable(batch), options, selected, stale, oldest)
+                batch = []
+
+        if batch:
+            select_batch(RepeaterTable(batch), options, selected, stale, oldest)
+
+    seen = set()
+    unique = unique_repeaters(selected, seen)
+
+    counts = {}
+    for item, callsign in unique:
+        counts[callsign] = counts.get(callsign, 0) + 1
+
+    repeaters = []
+    turns = {}
+    for item, callsign in unique:
+        turns[callsign] = turns.get(callsign, 0) + 1
+        alias = callsign if counts[callsign] == 1 else f'{callsign} #{turns[callsign]}'
+
+        repeaters.append(JobRepeater(item, callsign, turns[callsign], alias))
+
+    return repeaters, [item for item, callsign in unique_repeaters(stale, seen)]
+
+
+def select_repeaters():
+    """Select the repeaters of this run into filtered_list and report the ones --max-age dropped"""
+    global filtered_list
+
+    filtered_list, stale = filter_list(None, args)
+
+    if args.max_age is not None:
+        report_pruned(stale)
+
+
+def report_pruned(stale):
+    """Count the work skipped for repeaters dropped by --max-age and add it to the run summary"""
+    if args.talkgroups:
+        # Each repeater would have cost a talkgroup request, its channels are known if the cache still has them
+        api_calls = len(stale)
+        channels = 0
+        for item in stale:
+            cache_file = os.path.join(cache_dir, f"device_{item.id}_talkgroup.json")
+            try:
+                with open(cache_file, 'r') as file:
+                    channels += sum(1 for tg in json.load(file) if 'talkgroup' in tg and tg.get('slot') is not None)
+            except (OSError, ValueError):
+                pass
+    else:
+        api_calls = 0
+        channels = sum(1 if item.rx == item.tx else 2 for item in stale)
+
+    summary['pruned'] = {'repeaters': len(stale), 'api_calls': api_calls, 'channels': channels}
+
+    if args.format == 'text':
+        print(f'Skipped {len(stale)} repeaters not seen for {args.max_age:g} days, '
+              f'saving {api_calls} API calls and {channels} channels')
+
+
+def count_api_call(url, result):
+    """
+    Count an API call per endpoint like "/device/{id}/talkgroup"
+
+    The result is fetched, cached, coalesced (fetched by a concurrent run), throttled or error.
+    """
+    path = url[len(bm_api):] if url.startswith(bm_api) else url
+    endpoint = re.sub(r'/\d+', '/{id}', path.split('?')[0])
+
+    with stats_lock:
+        results = api_stats['endpoints'].setdefault(endpoint, {})
+        results[result] = results.get(result, 0) + 1
+
+
+def api_request(url):
+    """GET a BrandMeister API URL, waiting and retrying while the API answers 429 Too Many Requests"""
+    import requests
+    import urllib3
+
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    try:
+        for attempt in range(api_retries + 1):
+            response = requests.get(url, verify=False)
+            if response.status_code != 429 or attempt == api_retries:
+                break
+
+            with stats_lock:
+                api_stats['throttled'] += 1
+            count_api_call(url, 'throttled')
+            retry_after = response.headers.get('Retry-After', '')
+            time.sleep(min(int(retry_after), 30) if retry_after.isdigit() else 2 ** attempt)
+
+        response.raise_for_status()
+    except Exception:
+        count_api_call(url, 'error')
+        raise
+
+    count_api_call(url, 'fetched')
+
+    return response
+
+
+def read_cache(cache_file):
+    """Cached API response while it is fresh, None if it is missing, expired or damaged"""
+    if not exists(cache_file) or time.time() - os.path.getmtime(cache_file) >= args.cache_ttl * 3600:
+        return None
+
+    try:
+        with open(cache_file, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None  # Damaged cache entry, fetch it again
+
+
+def api_get(path, delay=0, force=False):
+    """
+    Get a BrandMeister API resource, served from the cache directory while it is fresh
+
+    Concurrent zone.py runs missing the same resource make one request: the first one
+    fetches it while holding the lock of its cache file, the others read its result.
+
+    Args:
+        path (str): Resource path below the API base URL like "/talkgroup/91"
+        delay (float): Seconds to wait after a request which was not served from the cache
+        force (bool): Fetch the resource and rewrite its cache file even if the cached copy is fresh
+
+    Returns:
+        Decoded JSON response
+    """
+    if args.cache_ttl <= 0 and not force:
+        data = api_request(bm_api + path).json()
+        with stats_lock:
+            api_stats['requests'] += 1
+        if delay:
+            time.sleep(delay)
+        return data
+
+    cache_file = os.path.join(cache_dir, path.strip('/').replace('/', '_') + '.json')
+
+    data = None if force else read_cache(cache_file)
+    if data is not None:
+        with stats_lock:
+            api_stats['cached'] += 1
+        count_api_call(path, 'cached')
+        return data
+
+    with file_lock(cache_file):
+        # Another run fetched it while this one waited for the lock
+        data = None if force else read_cache(cache_file)
+        if data is not None:
+            with stats_lock:
+                api_stats['coalesced'] += 1
+            count_api_call(path, 'coalesced')
+            return data
+
+        data = api_request(bm_api + path).json()
+        with stats_lock:
+            api_stats['requests'] += 1
 
-        if not item['callsign'] in existing: existing[item['callsign']] = 0
-        existing[item['callsign']] += 1
-        item['turn'] = existing[item['callsign']]
+        temp_file = f'{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_file, 'w') as file:
+            json.dump(data, file)
+        os.replace(temp_file, cache_file)
 
-        filtered_list.append(item)
+    if delay:
+        time.sleep(delay)
 
-    f.close()
+    return data
 
 
-def get_talkgroup_channels(repeater_id):
+def get_talkgroup_name(tg_id, delay=0, force=False):
+    """Get the name of a talkgroup from BrandMeister API, None if it has no name"""
+    data = api_get(f'/talkgroup/{tg_id}', delay, force)
+
+    if 'Name' in data and data['Name']:
+        return data['Name']
+
+    return None
+
+
+def get_talkgroup_channels(repeater_id, force=False):
     """
     Get talkgroups for a specific repeater from BrandMeister API
     
     Args:
         repeater_id (int): Repeater ID
+        force (bool): Refetch even if the cache holds a fresh copy
         
     Returns:
         list: List of talkgroup IDs configured for this repeater
+
+    Raises:
+        Exception: When the API request fails, so the repeater can be retried instead of skipped
     """
-    try:
-        url = f'https://api.brandmeister.network/v2/device/{repeater_id}/talkgroup'
-        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        response = requests.get(url, verify=False)
-        response.raise_for_status()
-        talkgroups_data = response.json()
-        
-        # Extract talkgroup IDs
-        tg_ids = []
-        for tg in talkgroups_data:
-            if 'talkgroup' in tg and tg.get('slot') is not None:
-                tg_ids.append((tg['talkgroup'], tg['slot']))
-        
-        return tg_ids
-    except Exception as e:
-        print(f"Error fetching talkgroups for repeater {repeater_id}: {e}")
-        return []
+    talkgroups_data = api_get(f'/device/{repeater_id}/talkgroup', force=force)
+
+    # Extract talkgroup IDs
+    tg_ids = []
+    for tg in talkgroups_data:
+        if 'talkgroup' in tg and tg.get('slot') is not None:
+            tg_ids.append((tg['talkgroup'], tg['slot']))
+
+    return tg_ids
+
 
+class ZoneChannels(NamedTuple):
+    """Report rows and channel records collected while the channels of one zone are formatted"""
 
-def format_talkgroup_channel(item, tg_id, timeslot):
-    """Format a channel for a specific talkgroup"""
+    # Rows of the zone report, see summary_fields
+    rows: list
+    # Channels as plain records for the non XML targets
+    records: list
+
+
+def format_talkgroup_channel(item, tg_id, timeslot, name_base, collected):
+    """Format a channel for a specific talkgroup named name_base, collecting its report row and record"""
     global custom_values
-    global output_list
-    
-    # Check if talkgroup ID exists in contacts.csv
-    contact_name = None
-    try:
-        import csv
-        import os
-        contacts_file = os.path.join(args.output, 'contacts.csv')
-        if os.path.exists(contacts_file):
-            with open(contacts_file, 'r', newline='') as csvfile:
-                reader = csv.reader(csvfile)
-                next(reader)  # Skip header row 1
-                next(reader)  # Skip header row 2
-                for row in reader:
-                    if len(row) > 25 and row[25] == str(tg_id) and row[0]:  # Check if column A has a value
-                        contact_name = row[0]
-                        break
-    except Exception:
-        pass
-    
-    # If talkgroup ID is not in contacts.csv or column A is empty, fetch from BrandMeister API
-    tg_name = None
-    if not contact_name:
-        try:
-            url = f'https://api.brandmeister.network/v2/talkgroup/{tg_id}'
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-            response = requests.get(url, verify=False)
-            response.raise_for_status()
-            data = response.json()
-            if 'Name' in data and data['Name']:
-                tg_name = data['Name']
-        except Exception:
-            pass
-    
-    # Use contact name from contacts.csv if available, otherwise use talkgroup name from API or talkgroup ID
-    if contact_name:
-        name_base = contact_name
-    elif tg_name:
-        name_base = tg_name
-    else:
-        name_base = f"TG{tg_id}"
     
     # Add city prefix if option is enabled
     if args.city_prefix:
         # Get city name and create 3-char abbreviation
-        city = item['city'].split(',')[0].strip()
+        city = item.city.split(',')[0].strip()
         # Create abbreviation: use first 3 chars, or if shorter than 3 chars, pad with 'X'
         if len(city) >= 3:
             city_abbr = city[:3].upper()
@@ -261,13 +947,14 @@ def format_talkgroup_channel(item, tg_id, timeslot):
         ch_alias = name_base[:16]
         ukp_value = name_base[:16]
     
-    ch_rx = item['rx']
-    ch_tx = item['tx']
-    ch_cc = item['colorcode']
+    ch_rx = item.rx
+    ch_tx = item.tx
+    ch_cc = item.colorcode
     
-    # Add to output list for display
-    output_list.append([item['callsign'], ch_rx, ch_tx, ch_cc, item['city'], item['last_seen'],
-                        f"https://brandmeister.network/?page=repeater&id={item['id']} TG{tg_id}"])
+    # Add to the report rows for display
+    collected.rows.append([item.callsign, ch_rx, ch_tx, ch_cc, item.city, item.last_seen,
+                           f"https://brandmeister.network/?page=repeater&id={item.id} TG{tg_id}"])
+    add_channel_record(collected, item, ch_alias, timeslot, tg_id, name_base)
     
     return f'''
 <set name="ConventionalPersonality" alias="{ch_alias}" key="DGTLCONV6PT25">
@@ -297,24 +984,43 @@ def format_talkgroup_channel(item, tg_id, timeslot):
     '''
 
 
-def format_channel(item):
-    global existing
-    global output_list
+def add_channel_record(collected, item, alias, timeslot, tg_id=None, tg_name=None):
+    """Keep a channel of the zone being built for the csv and tglist targets"""
+    collected.records.append({
+        'alias': alias,
+        # Frequencies from the radio's point of view, it transmits on the repeater's input
+        'rx': item.tx,
+        'tx': item.rx,
+        'cc': item.colorcode,
+        'slot': timeslot,
+        'tg_id': tg_id,
+        'tg_name': tg_name,
+        'callsign': item.callsign,
+        'city': item.city,
+        'id': item.id,
+    })
+
+
+def format_channel(item, collected):
     global custom_values
 
-    if existing[item['callsign']] == 1:
-        ch_alias = item['callsign']
-    else:
-        ch_alias = f"{item['callsign']} #{item['turn']}"
+    ch_alias = item.alias
+
+    ch_rx = item.rx
+    ch_tx = item.tx
+    ch_cc = item.colorcode
 
-    ch_rx = item['rx']
-    ch_tx = item['tx']
-    ch_cc = item['colorcode']
+    collected.rows.append([ch_alias, ch_rx, ch_tx, ch_cc, item.city, item.last_seen,
+                           f"https://brandmeister.network/?page=repeater&id={item.id}"])
 
-    output_list.append([ch_alias, ch_rx, ch_tx, ch_cc, item['city'], item['last_seen'],
-                        f"https://brandmeister.network/?page=repeater&id={item['id']}"])
+    # Simplex repeaters get a single channel on slot 2
+    if item.rx == item.tx:
+        add_channel_record(collected, item, ch_alias, 2)
+    else:
+        add_channel_record(collected, item, f'{ch_alias} TS1', 1)
+        add_channel_record(collected, item, f'{ch_alias} TS2', 2)
 
-    if item['rx'] == item['tx']:
+    if item.rx == item.tx:
         return f'''
 <set name="ConventionalPersonality" alias="{ch_alias}" key="DGTLCONV6PT25">
   <field name="CP_PERSTYPE" Name="Digital">DGTLCONV6PT25</field>
@@ -392,8 +1098,6 @@ def format_channel(item):
 
 def cleanup_contact_uploads():
     """Delete files in the contact_uploads directory after processing"""
-    import os
-    
     # Clean up regular contact_uploads directory
     if exists('contact_uploads'):
         for file in os.listdir('contact_uploads'):
@@ -418,250 +1122,630 @@ def cleanup_contact_uploads():
                     print(f"Error deleting {file_path}: {e}")
 
 
-def process_channels():
-    global output_list
+def prepare_contacts():
+    """
+    Copy the contact template into the output directory and index it
 
-    if args.talkgroups:
-        # Collect all unique talkgroup IDs first
-        unique_talkgroups = set()
-        
-        # First pass: collect all talkgroup IDs
-        for item in filtered_list:
+    Returns:
+        tuple: Path of contacts.csv and its ContactTemplate
+    """
+    import csv
+    import shutil
+    from contacts import ContactTemplate, load
+    
+    # Create output directory if it doesn't exist
+    if not os.path.exists(args.output):
+        os.makedirs(args.output)
+
+    contacts_file = os.path.join(args.output, 'contacts.csv')
+
+    # A template given for the job was validated and indexed once, it is only written out here
+    if args.contacts:
+        template = load(args.contacts)
+        for problem in template.problems:
+            print(f'Contact template: {problem}')
+        template.write_csv(contacts_file)
+        print(f'Copied contact template {args.contacts} to {contacts_file}')
+        return contacts_file, template
+
+    # Check for custom template in user-specific contact_uploads directory first
+    user_uploads_dir = None
+    for dir_name in os.listdir('.'):
+        if dir_name.startswith('contact_uploads_'):
+            user_uploads_dir = dir_name
+            break
+
+    if user_uploads_dir:
+        custom_template = os.path.join(user_uploads_dir, 'contact_template.csv')
+        if exists(custom_template):
             try:
-                tg_channels = get_talkgroup_channels(item['id'])
-                for tg_id, slot in tg_channels:
-                    unique_talkgroups.add(tg_id)
+                shutil.copy(custom_template, contacts_file)
+                print(f"Copied custom contact_template.csv from {user_uploads_dir} to {contacts_file}")
+                # Template found and copied, skip to next section
             except Exception as e:
-                print(f"Error collecting talkgroups for {item['callsign']}: {e}")
-        
-        # Process contacts.csv first to ensure it exists with all needed talkgroups
+                report_error(f"Error copying custom contact template from {user_uploads_dir}: {e}")
+
+    # Then check regular contact_uploads directory
+    custom_template = os.path.join('contact_uploads', 'contact_template.csv')
+    if exists(custom_template) and not exists(contacts_file):
         try:
-            import csv
-            import time
-            import os
-            import shutil
-            
-            # Create output directory if it doesn't exist
-            if not os.path.exists(args.output):
-                os.makedirs(args.output)
-            
-            contacts_file = os.path.join(args.output, 'contacts.csv')
+            shutil.copy(custom_template, contacts_file)
+            print(f"Copied custom contact_template.csv from contact_uploads to {contacts_file}")
+        except Exception as e:
+            report_error(f"Error copying custom contact template: {e}")
+    # Fall back to default template if no custom template exists
+    elif exists('contact_template.csv') and not exists(contacts_file):
+        try:
+            shutil.copy('contact_template.csv', contacts_file)
+            print(f"Copied default contact_template.csv to {contacts_file}")
+        except Exception as e:
+            report_error(f"Error copying default contact template: {e}")
+
+    # Create empty contacts file if it doesn't exist
+    if not exists(contacts_file):
+        with open(contacts_file, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["ContactName", "Delete_Contact", "Rename_Contact", "Comments", "Delete_FiveToneCalls", 
+                            "FiveToneCalls-S5CLDLL_5TTELEGRAM", "FiveToneCalls-S5CLDLL_5TCALLADD", "Delete_MDCCalls", 
+                            "MDCCalls-AU_CALLLSTID", "MDCCalls-AU_MDCSYS", "MDCCalls-AU_RVRTPERS_Zone", 
+                            "MDCCalls-AU_RVRTPERS", "MDCCalls-AU_SPTPLDPL", "MDCCalls-AU_CALLTYPE", 
+                            "Delete_QuikCallIICalls", "QuikCallIICalls-QU_QCIISYS", "QuikCallIICalls-QU_RVRTPERS_Zone", 
+                            "QuikCallIICalls-QU_RVRTPERS", "QuikCallIICalls-QU_CALLFORMAT", "QuikCallIICalls-QU_TONEATXFRE", 
+                            "QuikCallIICalls-QU_CODEA", "QuikCallIICalls-QU_TONEBTXFRE", "QuikCallIICalls-QU_CODEB", 
+                            "QuikCallIICalls-QU_STRIPPLDPL", "Delete_DigitalCalls", "DigitalCalls-DU_CALLLSTID", 
+                            "DigitalCalls-DU_ROUTETYPE", "DigitalCalls-DU_CALLPRCDTNEN", "DigitalCalls-DU_RINGTYPE", 
+                            "DigitalCalls-DU_TXTMSGALTTNTP", "DigitalCalls-DU_CALLTYPE"])
+            writer.writerow(["Contact Name", "Delete_Contact", "Rename_Contact", "Comments", "Delete_FiveToneCalls", 
+                            "Five Tone Calls - Telegram", "Five Tone Calls - Address", "Delete_MDCCalls", 
+                            "MDC Calls - Call ID (Hex)", "MDC Calls - MDC System", "MDC Calls - Revert Channel Zone", 
+                            "MDC Calls - Revert Channel", "MDC Calls - Strip TPL/DPL", "MDC Calls - Call Type", 
+                            "Delete_QuikCallIICalls", "Quik CallII Calls - Quik-Call II System", 
+                            "Quik CallII Calls - Revert Channel Zone", "Quik CallII Calls - Revert Channel", 
+                            "Quik CallII Calls - Call Format", "Quik CallII Calls - Tone A Freq (Hz)", 
+                            "Quik CallII Calls - Tone A Code", "Quik CallII Calls - Tone B Freq (Hz)", 
+                            "Quik CallII Calls - Tone B Code", "Quik CallII Calls - Strip TPL/DPL", 
+                            "Delete_DigitalCalls", "Digital Calls - Call ID", "Digital Calls - Route Type", 
+                            "Digital Calls - Call Receive Tone", "Digital Calls - Ring Style", 
+                            "Digital Calls - Text Message Alert Tone", "Digital Calls - Call Type"])
+
+    # Read the existing CSV file
+    with open(contacts_file, 'r', newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        rows = list(reader)
+
+    return contacts_file, ContactTemplate(rows, contacts_file)
+
+
+def finalize_contacts(contacts_file, template, unique_talkgroups):
+    """Append a Group Call contact for every talkgroup not in contacts.csv yet and write it"""
+    import csv
+
+    rows = template.rows
+    # Keep the header rows (first 2 rows)
+    header_rows = rows[:2]
+    template_row = rows[2] if len(rows) > 2 else [''] * len(header_rows[0])
+    
+    # Talkgroup IDs of the template, to avoid duplicates
+    existing_tg_ids = template.names
+    
+    # Create new rows with talkgroup data
+    new_rows = []
+    for tg_id in sorted(unique_talkgroups):
+        # Extract only numeric characters from talkgroup ID
+        numeric_tg_id = ''.join(c for c in str(tg_id) if c.isdigit())
+        if numeric_tg_id and numeric_tg_id not in existing_tg_ids:  # Only add if not already in contacts
+            new_row = template_row.copy() if template_row else [''] * len(header_rows[0])
+            new_row[25] = numeric_tg_id    # Column Z: DigitalCalls-DU_CALLLSTID
+            # Column A: ContactName from API, already fetched while the zones were written
+            new_row[0] = fetch_talkgroup_name(numeric_tg_id) or numeric_tg_id
             
-            # Check for custom template in user-specific contact_uploads directory first
-            user_uploads_dir = None
-            for dir_name in os.listdir('.'):
-                if dir_name.startswith('contact_uploads_'):
-                    user_uploads_dir = dir_name
-                    break
-                    
-            if user_uploads_dir:
-                custom_template = os.path.join(user_uploads_dir, 'contact_template.csv')
-                if exists(custom_template):
-                    try:
-                        shutil.copy(custom_template, contacts_file)
-                        print(f"Copied custom contact_template.csv from {user_uploads_dir} to {contacts_file}")
-                        # Template found and copied, skip to next section
-                    except Exception as e:
-                        print(f"Error copying custom contact template from {user_uploads_dir}: {e}")
+            # Make sure row has enough columns
+            while len(new_row) <= 30:
+                new_row.append("")
+            # Set column AE (index 30) to "Group Call"
+            new_row[30] = "Group Call"
+            new_rows.append(new_row)
+    
+    # Write the updated CSV file with existing entries plus new ones
+    with open(contacts_file, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerows(header_rows)
+        writer.writerows(rows[2:])  # Write existing entries after headers
+        writer.writerows(new_rows)  # Append new unique entries
+    
+    print(f"Updated {contacts_file} with {len(new_rows)} new unique talkgroups (total: {len(rows[2:]) + len(new_rows)})")
+    summary['files'].append('contacts.csv')
+
+
+def fetch_talkgroup_name(tg_id):
+    """
+    Get a talkgroup name from BrandMeister API once per run
+
+    Worker threads asking for a name which is already being fetched wait for that request.
+
+    Returns:
+        str: Talkgroup name, None if it has none or the request failed
+    """
+    from concurrent.futures import Future
+
+    with names_lock:
+        future = talkgroup_names.get(str(tg_id))
+        owner = future is None
+        if owner:
+            future = talkgroup_names[str(tg_id)] = Future()
+
+    if owner:
+        name = None
+        try:
+            name = get_talkgroup_name(tg_id, delay=0.2)  # Be nice to the API
+            print(f"Fetched name for TG {tg_id}: {name if name else 'no name found'}")
+            # Failed requests are left out, a resumed run asks again
+            record_checkpoint({'type': 'name', 'tg': str(tg_id), 'name': name})
+        except Exception as api_error:
+            report_error(f"Error fetching name for TG {tg_id}: {api_error}")
+        future.set_result(name)
+
+    return future.result()
+
+
+def resolve_talkgroup_name(tg_id, contacts):
+    """
+    Name channels of a talkgroup like its contact
+
+    Args:
+        tg_id: Talkgroup ID
+        contacts (dict): Contact names by talkgroup ID from the contact template, empty for unnamed contacts
+
+    Returns:
+        str: Contact name from the template, otherwise the name from BrandMeister API
+    """
+    if contacts.get(str(tg_id)):
+        return contacts[str(tg_id)]
+
+    tg_name = fetch_talkgroup_name(tg_id)
+    if tg_name:
+        return tg_name
+
+    # Talkgroups missing from the template get a contact named by their ID, unnamed template contacts do not
+    numeric_tg_id = ''.join(c for c in str(tg_id) if c.isdigit())
+    return f"TG{tg_id}" if str(tg_id) in contacts or not numeric_tg_id else numeric_tg_id
+
+
+def fetch_repeater(item, contacts):
+    """
+    Fetch the talkgroups of a repeater and resolve their names, runs in a worker thread
+
+    Returns:
+        tuple: Talkgroup and slot pairs and channel names by talkgroup, None for the pairs if
+        the request failed
+    """
+    key = str(item.id)
+
+    if key in checkpoint['talkgroups']:
+        tg_channels = [tuple(pair) for pair in checkpoint['talkgroups'][key]]
+    else:
+        try:
+            tg_channels = get_talkgroup_channels(item.id)
+        except Exception as e:
+            report_error(f"Error fetching talkgroups for repeater {item.id}: {e}")
+            record_checkpoint({'type': 'failed', 'id': key, 'error': str(e)})
+            return None, {}
+        record_checkpoint({'type': 'repeater', 'id': key, 'talkgroups': tg_channels})
+
+    names = {tg_id: resolve_talkgroup_name(tg_id, contacts) for tg_id, slot in tg_channels}
+
+    return tg_channels, names
+
+
+def load_checkpoint(file_name):
+    """
+    Read the progress of an earlier run from its checkpoint into checkpoint
+
+    A run killed while writing leaves a partial last line, which is ignored. Checkpoints
+    of runs against another API URL are not used.
+
+    Returns:
+        bool: True if the checkpoint was loaded
+    """
+    with open(file_name, 'r') as file:
+        for line in file:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+
+            if event['type'] == 'checkpoint' and event['api'] != bm_api:
+                print(f'{file_name} was written for {event["api"]}, starting from the beginning')
+                checkpoint.update(talkgroups={}, names={}, failed={}, zones=set(), contacts=None)
+                return False
+            elif event['type'] == 'checkpoint':
+                checkpoint['contacts'] = event.get('contacts')
+            elif event['type'] == 'repeater':
+                checkpoint['talkgroups'][event['id']] = event['talkgroups']
+                checkpoint['failed'].pop(event['id'], None)
+            elif event['type'] == 'failed' and event['id'] not in checkpoint['talkgroups']:
+                checkpoint['failed'][event['id']] = event['error']
+            elif event['type'] == 'name':
+                checkpoint['names'][event['tg']] = event['name']
+            elif event['type'] == 'zone':
+                checkpoint['zones'].add(event['id'])
+
+    return True
+
+
+def start_checkpoint(contact_rows):
+    """
+    Continue the checkpoint of the output directory with --resume, otherwise start a new one
+
+    Args:
+        contact_rows (int): Rows of contacts.csv before this run appends talkgroups to it
+
+    Returns:
+        int: Rows of contacts.csv which came from the template, the rest were appended by
+        the run being resumed
+    """
+    from concurrent.futures import Future
+    global checkpoint_path
+
+    os.makedirs(args.output, exist_ok=True)
+    checkpoint_path = os.path.join(args.output, checkpoint_file)
+
+    if args.resume and exists(checkpoint_path) and load_checkpoint(checkpoint_path):
+        print(f"Resuming from {checkpoint_path}: {len(checkpoint['talkgroups'])} repeaters and "
+              f"{len(checkpoint['names'])} talkgroup names resolved, {len(checkpoint['zones'])} zones written, "
+              f"{len(checkpoint['failed'])} failed repeaters to retry")
+
+        # Names resolved before count as fetched by this run
+        for tg_id, name in checkpoint['names'].items():
+            future = Future()
+            future.set_result(name)
+            talkgroup_names[tg_id] = future
+
+        return checkpoint['contacts'] if checkpoint['contacts'] is not None else contact_rows
+
+    # A checkpoint for another API URL was reported by load_checkpoint()
+    if args.resume and not exists(checkpoint_path):
+        print(f'No checkpoint in {args.output}, starting from the beginning')
+
+    with open(checkpoint_path, 'w') as file:
+        file.write(json.dumps({'type': 'checkpoint', 'api': bm_api, 'started': datetime.now().isoformat(),
+                               'contacts': contact_rows}) + '\n')
+
+    return contact_rows
+
+
+def record_checkpoint(event):
+    """Append an event to the checkpoint, worker threads record what they resolved"""
+    if checkpoint_path is None:
+        return
+
+    with checkpoint_lock:
+        with open(checkpoint_path, 'a') as file:
+            file.write(json.dumps(event) + '\n')
+
+
+def finish_checkpoint():
+    """List the repeaters which failed, the checkpoint is only kept to retry them"""
+    failed = list(dict.fromkeys(failed_repeaters))
+    summary['failed_repeaters'] = failed
+
+    if failed:
+        listed = ', '.join(failed[:20]) + (f' and {len(failed) - 20} more' if len(failed) > 20 else '')
+        print(f"Talkgroups of {len(failed)} repeaters could not be fetched: {listed}. "
+              f"Run again with --resume to retry only these.")
+    elif exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+
+def talkgroup_zone_name(item):
+    """
+    Zone file name and zone alias of the talkgroup mode zone of a repeater
+
+    Returns:
+        tuple: File name without extension, which can be longer, and a zone alias of 16 characters or less
+    """
+    # Use city name for zone name
+    city = item.city.split(',')[0].strip()
+    callsign = item.callsign
+
+    # Create filename (can be longer)
+    filename = f"{callsign}_{city.replace(' ', '_')}"
+
+    # Create zone alias (must be 16 chars or less)
+    if len(callsign) + 1 >= 16:
+        # If callsign is already too long, just use it
+        zone_alias = callsign[:16]
+    else:
+        # Use remaining space for city
+        city_max_len = 15 - len(callsign)
+        city_abbr = city.replace(' ', '')[:city_max_len]
+        zone_alias = f"{callsign}_{city_abbr}"
+
+    # Ensure it's exactly 16 chars or less
+    return filename, zone_alias[:16]
+
+
+class TalkgroupZone(NamedTuple):
+    """Everything needed to format the zone of one repeater in talkgroup mode, small enough to send to a worker"""
+
+    # Device record carrying the display callsign of the job
+    repeater: Repeater
+    filename: str
+    zone_alias: str
+    # Talkgroup ID, time slot and channel name of every channel
+    channels: tuple
+    # Write the zone file while formatting, instead of sending the XML back to the main process
+    write: bool
+
+
+def init_render_worker(job_args, job_custom_values):
+    """Give a render worker process the options of the job, a spawned worker does not inherit them"""
+    global args
+    global custom_values
+
+    args = job_args
+    custom_values = job_custom_values
+
+
+def render_talkgroup_zones(zones):
+    """
+    Format talkgroup mode zones, in a render worker process with --render-workers
+
+    Args:
+        zones (list): TalkgroupZone records
+
+    Returns:
+        list: For every zone its channel XML (None if the zone file was written), number of channels,
+        collected ZoneChannels and the table printed with --format text, or the exception formatting it raised
+    """
+    rendered = []
+    for zone in zones:
+        collected = ZoneChannels([], [])
+        try:
+            channels = ''.join(format_talkgroup_channel(zone.repeater, tg_id, slot, name, collected)
+                               for tg_id, slot, name in zone.channels)
+            table = format_report(collected.rows) if args.format == 'text' else None
+            channel_count = count_channels(channels)
+            if zone.write:
+                save_zone_file(zone.filename, format_config([format_zone(zone.zone_alias, channels)]))
+                channels = None
+        except Exception as e:
+            rendered.append(e)
+            continue
+        rendered.append((channels, channel_count, collected, table))
+
+    return rendered
+
+
+def emit_talkgroup_zones(zones, rendered):
+    """Report formatted talkgroup mode zones in the order of the repeater list, whichever worker formatted them"""
+    for zone, result in zip(zones, rendered):
+        if isinstance(result, Exception):
+            report_error(f"Error processing talkgroups for {zone.repeater.callsign}: {result}")
+            continue
+
+        channels, channel_count, collected, table = result
+        emit_zone(zone.filename, zone.zone_alias, channels, collected, table, channel_count)
+        record_checkpoint({'type': 'zone', 'id': str(zone.repeater.id), 'file': zone.filename})
+
+
+def process_channels():
+    global renderers
+
+    renderers = make_renderers()
+
+    if args.talkgroups:
+        from concurrent.futures import ThreadPoolExecutor
+
+        from contacts import ContactTemplate
+
+        contacts_file = None
+        template = ContactTemplate([])
+        try:
+            contacts_file, template = prepare_contacts()
+        except Exception as e:
+            report_error(f"Error reading contacts.csv: {e}")
+
+        # Contacts the interrupted run appended to the template are appended again when it is resumed
+        template_rows = start_checkpoint(len(template.rows))
+        if template_rows < len(template.rows):
+            template = ContactTemplate(template.rows[:template_rows], template.source)
+        contacts = template.names
+        
+        unique_talkgroups = set()
+        
+        # Talkgroups and names are fetched by worker threads, each zone is written as soon as
+        # its repeater is resolved, in the order of the repeater list. With --render-workers
+        # batches of zones are formatted by worker processes while the next ones are fetched.
+        render_pool = None
+        if args.render_workers > 1:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # Forking while the fetch threads hold locks could leave a worker stuck, spawned ones start clean
+            render_pool = ProcessPoolExecutor(args.render_workers, multiprocessing.get_context('spawn'),
+                                              init_render_worker, (args, custom_values))
+        rendering = deque()
+        batch = []
+        # Zone files written while formatting. A file name used again for a later repeater is
+        # written by the main process, after the earlier zone, so the later one is kept.
+        write_zones = 'cps2' in args.targets and not args.delta and not args.combine
+        zone_files = set()
+
+        with ThreadPoolExecutor(max_workers=args.fetch_workers) as executor, render_pool or nullcontext():
+            results = executor.map(lambda item: fetch_repeater(item, contacts), filtered_list)
             
-            # Then check regular contact_uploads directory
-            custom_template = os.path.join('contact_uploads', 'contact_template.csv')
-            if exists(custom_template) and not exists(contacts_file):
+            for item in filtered_list:
                 try:
-                    shutil.copy(custom_template, contacts_file)
-                    print(f"Copied custom contact_template.csv from contact_uploads to {contacts_file}")
-                except Exception as e:
-                    print(f"Error copying custom contact template: {e}")
-            # Fall back to default template if no custom template exists
-            elif exists('contact_template.csv') and not exists(contacts_file):
-                try:
-                    shutil.copy('contact_template.csv', contacts_file)
-                    print(f"Copied default contact_template.csv to {contacts_file}")
-                except Exception as e:
-                    print(f"Error copying default contact template: {e}")
-            
-            # Create empty contacts file if it doesn't exist
-            if not exists(contacts_file):
-                with open(contacts_file, 'w', newline='') as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow(["ContactName", "Delete_Contact", "Rename_Contact", "Comments", "Delete_FiveToneCalls", 
-                                    "FiveToneCalls-S5CLDLL_5TTELEGRAM", "FiveToneCalls-S5CLDLL_5TCALLADD", "Delete_MDCCalls", 
-                                    "MDCCalls-AU_CALLLSTID", "MDCCalls-AU_MDCSYS", "MDCCalls-AU_RVRTPERS_Zone", 
-                                    "MDCCalls-AU_RVRTPERS", "MDCCalls-AU_SPTPLDPL", "MDCCalls-AU_CALLTYPE", 
-                                    "Delete_QuikCallIICalls", "QuikCallIICalls-QU_QCIISYS", "QuikCallIICalls-QU_RVRTPERS_Zone", 
-                                    "QuikCallIICalls-QU_RVRTPERS", "QuikCallIICalls-QU_CALLFORMAT", "QuikCallIICalls-QU_TONEATXFRE", 
-                                    "QuikCallIICalls-QU_CODEA", "QuikCallIICalls-QU_TONEBTXFRE", "QuikCallIICalls-QU_CODEB", 
-                                    "QuikCallIICalls-QU_STRIPPLDPL", "Delete_DigitalCalls", "DigitalCalls-DU_CALLLSTID", 
-                                    "DigitalCalls-DU_ROUTETYPE", "DigitalCalls-DU_CALLPRCDTNEN", "DigitalCalls-DU_RINGTYPE", 
-                                    "DigitalCalls-DU_TXTMSGALTTNTP", "DigitalCalls-DU_CALLTYPE"])
-                    writer.writerow(["Contact Name", "Delete_Contact", "Rename_Contact", "Comments", "Delete_FiveToneCalls", 
-                                    "Five Tone Calls - Telegram", "Five Tone Calls - Address", "Delete_MDCCalls", 
-                                    "MDC Calls - Call ID (Hex)", "MDC Calls - MDC System", "MDC Calls - Revert Channel Zone", 
-                                    "MDC Calls - Revert Channel", "MDC Calls - Strip TPL/DPL", "MDC Calls - Call Type", 
-                                    "Delete_QuikCallIICalls", "Quik CallII Calls - Quik-Call II System", 
-                                    "Quik CallII Calls - Revert Channel Zone", "Quik CallII Calls - Revert Channel", 
-                                    "Quik CallII Calls - Call Format", "Quik CallII Calls - Tone A Freq (Hz)", 
-                                    "Quik CallII Calls - Tone A Code", "Quik CallII Calls - Tone B Freq (Hz)", 
-                                    "Quik CallII Calls - Tone B Code", "Quik CallII Calls - Strip TPL/DPL", 
-                                    "Delete_DigitalCalls", "Digital Calls - Call ID", "Digital Calls - Route Type", 
-                                    "Digital Calls - Call Receive Tone", "Digital Calls - Ring Style", 
-                                    "Digital Calls - Text Message Alert Tone", "Digital Calls - Call Type"])
-            
-            # Read the existing CSV file
-            with open(contacts_file, 'r', newline='') as csvfile:
-                reader = csv.reader(csvfile)
-                rows = list(reader)
-            
-            # Keep the header rows (first 2 rows)
-            header_rows = rows[:2]
-            template_row = rows[2] if len(rows) > 2 else [''] * len(header_rows[0])
-            
-            # Get existing talkgroup IDs to avoid duplicates
-            existing_tg_ids = set()
-            for row in rows[2:]:  # Skip header rows
-                if len(row) > 25 and row[25]:  # Check if column Z has a value
-                    existing_tg_ids.add(row[25])
-            
-            # Create new rows with talkgroup data
-            new_rows = []
-            for tg_id in sorted(unique_talkgroups):
-                # Extract only numeric characters from talkgroup ID
-                numeric_tg_id = ''.join(c for c in str(tg_id) if c.isdigit())
-                if numeric_tg_id and numeric_tg_id not in existing_tg_ids:  # Only add if not already in contacts
-                    new_row = template_row.copy() if template_row else [''] * len(header_rows[0])
-                    new_row[25] = numeric_tg_id    # Column Z: DigitalCalls-DU_CALLLSTID
+                    tg_channels, names = next(results)
+                    if tg_channels is None:
+                        failed_repeaters.append(str(item.id))
+                        continue
+                    for tg_id, slot in tg_channels:
+                        unique_talkgroups.add(tg_id)
+                    if not tg_channels:
+                        continue  # Skip repeaters with no talkgroups
                     
-                    # Check if this talkgroup ID already exists in contacts.csv with a name
-                    existing_name = None
-                    for row in rows[2:]:  # Skip header rows
-                        if len(row) > 25 and row[25] == numeric_tg_id and row[0]:
-                            existing_name = row[0]
-                            break
-                    
-                    if existing_name:
-                        # Use existing name from contacts.csv
-                        new_row[0] = existing_name
-                        print(f"Using existing name for TG {numeric_tg_id}: {existing_name}")
-                    else:
-                        # Fetch talkgroup name from BrandMeister API
-                        try:
-                            print(f"Fetching name for TG {numeric_tg_id}...", end="", flush=True)
-                            url = f'https://api.brandmeister.network/v2/talkgroup/{numeric_tg_id}'
-                            response = requests.get(url, verify=False)
-                            response.raise_for_status()
-                            data = response.json()
-                            if 'Name' in data and data['Name']:
-                                new_row[0] = data['Name']  # Column A: ContactName from API
-                                print(f" Found: {data['Name']}")
-                            else:
-                                new_row[0] = numeric_tg_id  # Fallback to ID if no name
-                                print(" No name found")
-                            time.sleep(0.2)  # Be nice to the API
-                        except Exception as api_error:
-                            print(f"\nError fetching name for TG {numeric_tg_id}: {api_error}")
-                            new_row[0] = numeric_tg_id  # Fallback to ID if API fails
-                    
-                    # Make sure row has enough columns
-                    while len(new_row) <= 30:
-                        new_row.append("")
-                    # Set column AE (index 30) to "Group Call"
-                    new_row[30] = "Group Call"
-                    new_rows.append(new_row)
-            
-            # Write the updated CSV file with existing entries plus new ones
-            with open(contacts_file, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerows(header_rows)
-                writer.writerows(rows[2:])  # Write existing entries after headers
-                writer.writerows(new_rows)  # Append new unique entries
+                    filename, zone_alias = talkgroup_zone_name(item)
+                    batch.append(TalkgroupZone(item.repeater._replace(callsign=item.callsign), filename, zone_alias,
+                                               tuple((tg_id, slot, names[tg_id]) for tg_id, slot in tg_channels),
+                                               write_zones and filename not in zone_files))
+                    zone_files.add(filename)
+                except Exception as e:
+                    report_error(f"Error processing talkgroups for {item.callsign}: {e}")
+                
+                if render_pool is None:
+                    emit_talkgroup_zones(batch, render_talkgroup_zones(batch))
+                    batch = []
+                elif len(batch) == render_batch_size:
+                    rendering.append((batch, render_pool.submit(render_talkgroup_zones, batch)))
+                    batch = []
+                    # Keep the workers busy without formatting far ahead of what is written
+                    while len(rendering) > render_queue_depth * args.render_workers:
+                        zones, future = rendering.popleft()
+                        emit_talkgroup_zones(zones, future.result())
             
-            print(f"Updated {contacts_file} with {len(new_rows)} new unique talkgroups (total: {len(rows[2:]) + len(new_rows)})")
-        except Exception as e:
-            print(f"Error updating contacts.csv: {e}")
+            if batch:
+                rendering.append((batch, render_pool.submit(render_talkgroup_zones, batch)))
+            while rendering:
+                zones, future = rendering.popleft()
+                emit_talkgroup_zones(zones, future.result())
         
-        # Now create channels using the updated contacts.csv
-        for item in filtered_list:
-            channels = ''
-            output_list = []
-            
+        # contacts.csv is finished once all talkgroups are known
+        if contacts_file:
             try:
-                tg_channels = get_talkgroup_channels(item['id'])
-                if not tg_channels:
-                    continue  # Skip repeaters with no talkgroups
-                    
-                for tg_id, slot in tg_channels:
-                    channels += format_talkgroup_channel(item, tg_id, slot)
-                
-                # Use city name for zone name
-                city = item['city'].split(',')[0].strip()
-                callsign = item['callsign']
-                
-                # Create filename (can be longer)
-                filename = f"{callsign}_{city.replace(' ', '_')}"
-                
-                # Create zone alias (must be 16 chars or less)
-                if len(callsign) + 1 >= 16:
-                    # If callsign is already too long, just use it
-                    zone_alias = callsign[:16]
-                else:
-                    # Use remaining space for city
-                    city_max_len = 15 - len(callsign)
-                    city_abbr = city.replace(' ', '')[:city_max_len]
-                    zone_alias = f"{callsign}_{city_abbr}"
-                # Ensure it's exactly 16 chars or less
-                zone_alias = zone_alias[:16]
-                
-                print('\n',
-                      tabulate(output_list, headers=['Callsign', 'RX', 'TX', 'CC', 'City', 'Last seen', 'URL'],
-                               disable_numparse=True),
-                      '\n')
-                
-                write_zone_file(filename, f'''<?xml version=\"1.0\" encoding=\"utf-8\" standalone=\"yes\"?>
-<config>
-  <category name=\"Zone\">
-    <set name=\"Zone\" alias=\"{zone_alias}\" key=\"NORMAL\">
-      <collection name=\"ZoneItems\">
-        {channels}
-      </collection>
-      <field name=\"ZP_ZONEALIAS\">{zone_alias}</field>
-      <field name=\"ZP_ZONETYPE\" Name=\"Normal\">NORMAL</field>
-      <field name=\"ZP_ZVFNLITEM\" Name=\"None\">NONE</field>
-      <field name=\"Comments\"></field>
-    </set>
-  </category>
-</config>
-''')
+                finalize_contacts(contacts_file, template, unique_talkgroups)
             except Exception as e:
-                print(f"Error processing talkgroups for {item['callsign']}: {e}")
-        
+                report_error(f"Error updating contacts.csv: {e}")
+
+        finish_checkpoint()
 
     else:
         # Original behavior for non-talkgroup mode
-        channel_chunks = [filtered_list[i:i + args.zone_capacity] for i in range(0, len(filtered_list), args.zone_capacity)]
+        if args.cluster:
+            zones, remaining = cluster_zones(filtered_list, args.zone_capacity)
+        else:
+            zones, remaining = [], filtered_list
+
+        # Repeaters in callsign order, or those without coordinates when clustering
+        channel_chunks = [remaining[i:i + args.zone_capacity] for i in range(0, len(remaining), args.zone_capacity)]
         chunk_number = 0
 
         for chunk in channel_chunks:
-            channels = ''
             chunk_number += 1
-            output_list = []
-
-            for item in chunk:
-                channels += format_channel(item)
-
-            print('\n',
-                  tabulate(output_list, headers=['Callsign', 'RX', 'TX', 'CC', 'City', 'Last seen', 'URL'],
-                           disable_numparse=True),
-                  '\n')
 
             if len(channel_chunks) == 1:
                 zone_alias = args.name
             else:
                 zone_alias = f'{args.name} #{chunk_number}'
 
-            write_zone_file(zone_alias, f'''<?xml version=\"1.0\" encoding=\"utf-8\" standalone=\"yes\"?>
-<config>
-  <category name=\"Zone\">
-    <set name=\"Zone\" alias=\"{zone_alias}\" key=\"NORMAL\">
+            zones.append((zone_alias, chunk))
+
+        for zone_alias, chunk in zones:
+            channels = ''
+            collected = ZoneChannels([], [])
+
+            for item in chunk:
+                channels += format_channel(item, collected)
+
+            emit_zone(zone_alias, zone_alias, channels, collected)
+
+    for renderer in renderers:
+        renderer.finish()
+
+
+def bisect_rows(x, y, rows, parts):
+    """
+    Split rows into parts compact groups by recursive median cuts across the wider axis
+
+    Group sizes differ by at most one, so no group exceeds the capacity the number of parts was chosen for.
+    """
+    import numpy as np
+
+    if parts == 1:
+        return [rows]
+
+    axis = x[rows] if np.ptp(x[rows]) >= np.ptp(y[rows]) else y[rows]
+    order = rows[np.argsort(axis, kind='stable')]
+    first = parts // 2
+    split = len(rows) * first // parts
+
+    return bisect_rows(x, y, order[:split], first) + bisect_rows(x, y, order[split:], parts - first)
+
+
+def representative_city(items, x, y):
+    """Most common city of a zone, ties going to the city nearest its center"""
+    import numpy as np
+    from collections import Counter
+
+    distance = (x - x.mean()) ** 2 + (y - y.mean()) ** 2
+    cities = [items[i].city.split(',')[0].strip() for i in np.argsort(distance, kind='stable')]
+    # Counter keeps first seen order for equal counts
+    counts = Counter(city for city in cities if city)
+
+    return counts.most_common(1)[0][0] if counts else items[0].callsign
+
+
+def cluster_zones(items, capacity):
+    """
+    Partition repeaters into geographically compact zones
+
+    Args:
+        items (list): Selected repeaters in channel order
+        capacity (int): Most repeaters in one zone
+
+    Returns:
+        tuple: List of (zone alias, repeaters) named after their representative city, and
+        the repeaters without coordinates
+    """
+    import numpy as np
+
+    lat = np.array([item.lat for item in items], dtype=np.float64)
+    lng = np.array([item.lng for item in items], dtype=np.float64)
+    located = np.flatnonzero(~np.isnan(lat) & ~np.isnan(lng))
+    unlocated = [items[i] for i in np.flatnonzero(np.isnan(lat) | np.isnan(lng))]
+
+    if not len(located):
+        return [], unlocated
+
+    # Equirectangular projection, a degree of longitude shrinks with the cosine of the latitude
+    y = lat
+    x = lng * np.cos(np.radians(lat[located].mean()))
+
+    zones = []
+    for rows in bisect_rows(x, y, located, -(-len(located) // capacity)):
+        # Channels keep the callsign order of the repeater list within a zone
+        rows = np.sort(rows)
+        city = representative_city([items[i] for i in rows], x[rows], y[rows])
+        # The alias is also the file name of the zone
+        city = re.sub(r'[/\\]', '-', city)
+        zones.append((city, float(x[rows].mean()), [items[i] for i in rows]))
+
+    # Sorted by city, zones sharing an alias are numbered from west to east
+    zones.sort(key=lambda zone: (zone[0], zone[1]))
+    counts = {}
+    for city, center, chunk in zones:
+        counts[city[:16]] = counts.get(city[:16], 0) + 1
+
+    result = []
+    used = set()
+    turns = {}
+    for city, center, chunk in zones:
+        name = city[:16]
+        zone_alias = name
+        # A numbered alias is cut to 16 characters as well, so it may already be taken
+        while counts[name] > 1 and zone_alias == name or zone_alias in used:
+            turns[name] = turns.get(name, 0) + 1
+            suffix = f' #{turns[name]}'
+            zone_alias = name[:16 - len(suffix)] + suffix
+        used.add(zone_alias)
+        result.append((zone_alias, chunk))
+
+    return result, unlocated
+
+
+def format_zone(zone_alias, channels):
+    """Format a Zone set holding the given channels"""
+    return f'''    <set name=\"Zone\" alias=\"{zone_alias}\" key=\"NORMAL\">
       <collection name=\"ZoneItems\">
         {channels}
       </collection>
@@ -670,29 +1754,614 @@ def process_channels():
       <field name=\"ZP_ZVFNLITEM\" Name=\"None\">NONE</field>
       <field name=\"Comments\"></field>
     </set>
-  </category>
+'''
+
+
+def format_config(zones):
+    """Wrap formatted Zone sets into a document which can be pasted into CPS2"""
+    zone_sets = ''.join(zones)
+
+    return f'''<?xml version=\"1.0\" encoding=\"utf-8\" standalone=\"yes\"?>
+<config>
+  <category name=\"Zone\">
+{zone_sets}  </category>
 </config>
-''')
+'''
 
 
-def write_zone_file(zone_alias, contents):
-    import os
-    
-    # Create output directory if it doesn't exist
+def report_error(message):
+    """Print an error and keep it for the run summary"""
+    print(message)
+    summary['errors'].append(message.strip())
+
+
+def format_report(rows):
+    """Table of the repeaters of a zone printed with --format text"""
+    from tabulate import tabulate
+
+    return tabulate(rows, headers=['Callsign', 'RX', 'TX', 'CC', 'City', 'Last seen', 'URL'], disable_numparse=True)
+
+
+def report_zone(zone_alias, channel_count, rows, table=None):
+    """Report the rows collected for a zone in the format chosen by --format"""
+    if args.format == 'text':
+        print('\n', table if table is not None else format_report(rows), '\n')
+        return None
+
+    if args.format == 'quiet':
+        return None
+
+    zone = {'zone': zone_alias, 'file': None, 'channels': channel_count}
+    rows = [dict(zip(summary_fields, row), zone=zone_alias) for row in rows]
+
+    summary['zones'].append(zone)
+    summary['channels'].extend(rows)
+
+    if args.format == 'jsonl':
+        os.makedirs(args.output, exist_ok=True)
+        with open(os.path.join(args.output, 'run_summary.jsonl'), 'a') as file:
+            for row in rows:
+                file.write(json.dumps(dict(row, type='channel')) + '\n')
+
+    return zone
+
+
+def write_summary():
+    """Write the run summary for --format json or finish it for --format jsonl"""
+    result = {
+        'mode': 'talkgroup' if args.talkgroups else 'standard',
+        'repeaters': len(filtered_list),
+        'zones': summary['zones'],
+        # Talkgroup mode may write the same file for several repeaters
+        'files': list(dict.fromkeys(summary['files'])),
+        'errors': summary['errors'],
+        'api': api_stats,
+    }
+    if 'pruned' in summary:
+        result['pruned'] = summary['pruned']
+    if 'memory' in summary:
+        result['memory'] = summary['memory']
+    if 'failed_repeaters' in summary:
+        result['failed_repeaters'] = summary['failed_repeaters']
+    os.makedirs(args.output, exist_ok=True)
+
+    if args.format == 'json':
+        result['channels'] = summary['channels']
+        with open(os.path.join(args.output, 'run_summary.json'), 'w') as file:
+            json.dump(result, file, indent=1)
+    elif args.format == 'jsonl':
+        with open(os.path.join(args.output, 'run_summary.jsonl'), 'a') as file:
+            for zone in summary['zones']:
+                file.write(json.dumps(dict(zone, type='zone')) + '\n')
+            file.write(json.dumps(dict(result, type='summary', zones=len(summary['zones']))) + '\n')
+
+
+def count_channels(channels):
+    return channels.count('name="ConventionalPersonality"')
+
+
+def emit_zone(filename, zone_alias, channels, collected, table=None, channel_count=None):
+    """
+    Report a zone and hand it with the channel records collected for it to the renderer of every target
+
+    Channels are None for a zone whose file a render worker already wrote, channel_count is given then.
+    """
+    zone = report_zone(zone_alias, count_channels(channels) if channel_count is None else channel_count,
+                       collected.rows, table)
+
+    for renderer in renderers:
+        renderer.add_zone(filename, zone_alias, channels, collected.records, zone)
+
+
+class Cps2Renderer:
+    """CPS2 zone XML, one file per zone, combined with --combine or compared with --delta"""
+
+    def add_zone(self, filename, zone_alias, channels, records, zone):
+        if channels is None:
+            report_zone_file(filename)
+            if zone:
+                zone['file'] = summary['files'][-1]
+        elif args.delta:
+            delta_zones.append((zone_alias, channels))
+        elif args.combine:
+            pending_zones.append((format_zone(zone_alias, channels), zone))
+        else:
+            write_zone_file(filename, format_config([format_zone(zone_alias, channels)]))
+            if zone:
+                zone['file'] = summary['files'][-1]
+
+    def finish(self):
+        flush_zones()
+        if args.delta:
+            write_delta()
+
+
+class ChannelCsvRenderer:
+    """channels.csv with one row per channel, for programming software of other radios"""
+
+    header = ['Zone', 'Channel Name', 'RX Frequency', 'TX Frequency', 'Color Code', 'Time Slot', 'Contact',
+              'Contact ID', 'Callsign', 'City', 'Repeater ID']
+
+    def __init__(self):
+        self.rows = []
+
+    def add_zone(self, filename, zone_alias, channels, records, zone):
+        for record in records:
+            self.rows.append([zone_alias, record['alias'], record['rx'], record['tx'], record['cc'], record['slot'],
+                              record['tg_name'] or '', record['tg_id'] or '', record['callsign'], record['city'],
+                              record['id']])
+
+    def finish(self):
+        write_csv_file('channels.csv', self.header, self.rows)
+
+
+class TalkgroupCsvRenderer:
+    """talkgroups.csv listing every talkgroup found with the repeaters and time slots carrying it"""
+
+    header = ['Talkgroup ID', 'Name', 'Call Type', 'Repeaters', 'Time Slots']
+
+    def __init__(self):
+        self.talkgroups = {}
+
+    def add_zone(self, filename, zone_alias, channels, records, zone):
+        for record in records:
+            talkgroup = self.talkgroups.setdefault(str(record['tg_id']), {'name': record['tg_name'],
+                                                                          'repeaters': set(), 'slots': set()})
+            talkgroup['repeaters'].add(record['id'])
+            talkgroup['slots'].add(str(record['slot']))
+
+    def finish(self):
+        rows = []
+        for tg_id, talkgroup in sorted(self.talkgroups.items(),
+                                       key=lambda pair: (not pair[0].isdigit(), int(pair[0]) if pair[0].isdigit()
+                                                         else 0, pair[0])):
+            rows.append([tg_id, talkgroup['name'], 'Group Call', len(talkgroup['repeaters']),
+                         ';'.join(sorted(talkgroup['slots']))])
+
+        write_csv_file('talkgroups.csv', self.header, rows)
+
+
+def make_renderers():
+    """Renderers of the targets chosen with --targets"""
+    classes = {'cps2': Cps2Renderer, 'csv': ChannelCsvRenderer, 'tglist': TalkgroupCsvRenderer}
+
+    return [classes[target]() for target in TARGETS if target in args.targets]
+
+
+def write_csv_file(name, header, rows):
+    import csv
+
     if not os.path.exists(args.output):
         os.makedirs(args.output)
+
+    file_name = os.path.join(args.output, name)
+    with open(file_name, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+    print(f'CSV file "{file_name}" written.')
+    summary['files'].append(name)
+
+
+def flush_zones():
+    """Write zones kept back by --combine, split evenly into the requested number of files"""
+    global pending_zones
+
+    if not pending_zones:
+        return
+
+    shards = min(args.combine, len(pending_zones))
+    base_name = args.name if args.name else 'zones'
+    size, remainder = divmod(len(pending_zones), shards)
+    start = 0
+
+    for shard in range(shards):
+        end = start + size + (1 if shard < remainder else 0)
+        filename = base_name if shards == 1 else f'{base_name}_{shard + 1}'
+        write_zone_file(filename, format_config([zone_set for zone_set, zone in pending_zones[start:end]]))
+        for zone_set, zone in pending_zones[start:end]:
+            if zone:
+                zone['file'] = summary['files'][-1]
+        start = end
+
+    pending_zones = []
+
+
+def channel_key(channel):
+    """Frequencies, color code, slot and contact of a ConventionalPersonality element"""
+    fields = {field.get('name'): (field.text or '').strip() for field in channel.findall('field')}
+    key = []
+
+    for name in delta_key_fields:
+        value = fields.get(name, '')
+        if name in ('CP_TXFREQ', 'CP_RXFREQ') and value:
+            try:
+                value = f'{float(value):.5f}'
+            except ValueError:
+                pass
+        key.append(value)
+
+    return tuple(key)
+
+
+def index_channels(root):
+    """
+    Index the channels of a zone document
+
+    Args:
+        root (Element): Parsed <config> document
+
+    Returns:
+        dict: Channel key to a list of (zone alias, ConventionalPersonality element) tuples,
+        several repeaters may share frequencies, color code and slot
+    """
+    channels = {}
+
+    for zone in root.iter('set'):
+        if zone.get('name') != 'Zone':
+            continue
+        for channel in zone.iter('set'):
+            if channel.get('name') == 'ConventionalPersonality':
+                channels.setdefault(channel_key(channel), []).append((zone.get('alias'), channel))
+
+    return channels
+
+
+def channel_changed(generated, exported):
+    """Whether an exported channel differs in alias or in any field the generator sets"""
+    if generated.get('alias') != exported.get('alias'):
+        return True
+
+    exported_fields = {field.get('name'): (field.text or '').strip() for field in exported.findall('field')}
+
+    return any(exported_fields.get(field.get('name')) != (field.text or '').strip()
+               for field in generated.findall('field'))
+
+
+def match_channel(channel, candidates):
+    """Take the exported channel a generated one replaces from the candidates sharing its key, None if new"""
+    for number, (zone_alias, exported) in enumerate(candidates):
+        if exported.get('alias') == channel.get('alias'):
+            return candidates.pop(number)[1]
+
+    return candidates.pop(0)[1] if candidates else None
+
+
+def write_delta():
+    """Compare generated zones with the --delta export, write delta.xml and delta_summary.json"""
+    import xml.etree.ElementTree as ET
+
+    exported = index_channels(ET.parse(args.delta).getroot())
+    delta = {'added': [], 'changed': [], 'removed': [], 'unchanged': 0}
+    zones = []
+
+    for zone_alias, channels in delta_zones:
+        try:
+            root = ET.fromstring(format_config([format_zone(zone_alias, channels)]))
+        except ET.ParseError as e:
+            report_error(f'Error reading generated zone {zone_alias} for the delta: {e}')
+            continue
+
+        kept = []
+        for key, generated in index_channels(root).items():
+            # Exact alias matches first, so channels sharing a key are not paired up crosswise
+            generated.sort(key=lambda entry: not any(exported_channel.get('alias') == entry[1].get('alias')
+                                                     for exported_zone, exported_channel in exported.get(key, [])))
+
+            for generated_zone, channel in generated:
+                entry = {'zone': zone_alias, 'alias': channel.get('alias'), 'key': list(key)}
+                previous = match_channel(channel, exported.get(key, []))
+
+                if previous is None:
+                    delta['added'].append(entry)
+                elif channel_changed(channel, previous):
+                    delta['changed'].append(dict(entry, previous=previous.get('alias')))
+                else:
+                    delta['unchanged'] += 1
+                    continue
+
+                kept.append(ET.tostring(channel, encoding='unicode'))
+
+        if kept:
+            zones.append(format_zone(zone_alias, ''.join(kept)))
+
+    for key, remaining in exported.items():
+        for zone_alias, channel in remaining:
+            delta['removed'].append({'zone': zone_alias, 'alias': channel.get('alias'), 'key': list(key)})
+
+    if zones:
+        write_zone_file('delta', format_config(zones))
+
+    os.makedirs(args.output, exist_ok=True)
+    with open(os.path.join(args.output, 'delta_summary.json'), 'w') as file:
+        json.dump(delta, file, indent=1)
+    summary['files'].append('delta_summary.json')
+
+    print(f"Delta against {args.delta}: {len(delta['added'])} added, {len(delta['changed'])} changed, "
+          f"{len(delta['removed'])} removed, {delta['unchanged']} unchanged channels")
+    for entry in delta['removed']:
+        print(f"Remove channel {entry['alias']} from zone {entry['zone']}")
+
+
+def save_zone_file(zone_alias, contents):
+    """Write a zone file without reporting it, render workers write zones the main process reports"""
+    # Create output directory if it doesn't exist, workers may do so at the same time
+    os.makedirs(args.output, exist_ok=True)
     
     zone_file_name = os.path.join(args.output, zone_alias + ".xml")
     zone_file = open(zone_file_name, "wt")
     zone_file.write(contents)
     zone_file.close()
-    print(f'Zone file "{zone_file_name}" written.\n')
 
 
-if __name__ == '__main__':
+def report_zone_file(zone_alias):
+    summary['files'].append(zone_alias + ".xml")
+    print(f'Zone file "{os.path.join(args.output, zone_alias + ".xml")}" written.\n')
+
+
+def write_zone_file(zone_alias, contents):
+    save_zone_file(zone_alias, contents)
+    report_zone_file(zone_alias)
+
+
+def estimate_job():
+    """
+    Estimate a run from BM.json and the cache without network access or writing files
+
+    Talkgroup mode needs the talkgroups of each repeater for exact numbers. They are
+    counted from the cache where it has them, repeaters missing there are assumed to
+    carry as many talkgroups as the cached ones on average.
+
+    Returns:
+        dict: Repeaters, zones, channels, API calls, cached responses and estimated seconds
+    """
+    if not exists(bm_file):
+        raise SystemExit(f'{bm_file} is not downloaded yet, run without --dry-run once')
+
+    started = time.perf_counter()
+    select_repeaters()
+    seconds = time.perf_counter() - started
+    download = args.force
+
+    if not args.talkgroups:
+        channels = sum(1 if item.rx == item.tx else 2 for item in filtered_list)
+        if args.cluster:
+            clusters, remaining = cluster_zones(filtered_list, args.zone_capacity)
+            zones = len(clusters) + -(-len(remaining) // args.zone_capacity)
+        else:
+            zones = -(-len(filtered_list) // args.zone_capacity)
+        device_calls = name_calls = cached = 0
+    else:
+        known = []
+        talkgroups = set()
+        resumed = os.path.join(args.output, checkpoint_file)
+        if args.resume and exists(resumed):
+            load_checkpoint(resumed)
+
+        for item in filtered_list:
+            if str(item.id) in checkpoint['talkgroups']:
+                tg_ids = [tg_id for tg_id, slot in checkpoint['talkgroups'][str(item.id)]]
+                known.append(len(tg_ids))
+                talkgroups.update(tg_ids)
+                continue
+
+            data = read_cache(os.path.join(cache_dir, f"device_{item.id}_talkgroup.json")) \
+                if args.cache_ttl > 0 else None
+            if data is not None:
+                tg_ids = [tg['talkgroup'] for tg in data if 'talkgroup' in tg and tg.get('slot') is not None]
+                known.append(len(tg_ids))
+                talkgroups.update(tg_ids)
+
+        device_calls = len(filtered_list) - len(known)
+        # Names of talkgroups seen in the cache, those only uncached repeaters carry are not known yet
+        name_calls = sum(1 for tg_id in talkgroups if str(tg_id) not in checkpoint['names'] and
+                         (args.cache_ttl <= 0 or read_cache(os.path.join(cache_dir, f'talkgroup_{tg_id}.json')) is None))
+        cached = len(known) + len(talkgroups) - name_calls
+        average = sum(known) / len(known) if known else 2
+        channels = round(sum(known) + device_calls * average)
+        zones = sum(1 for count in known if count) + device_calls
+        seconds += (device_calls * estimated_request_seconds +
+                    name_calls * (estimated_request_seconds + 0.2)) / max(1, args.fetch_workers)
+
+    if download:
+        seconds += estimated_download_seconds
+
+    return {
+        'repeaters': len(filtered_list),
+        'zones': zones,
+        'channels': channels,
+        'api_calls': device_calls + name_calls + (1 if download else 0),
+        'cached': cached,
+        'seconds': round(seconds, 1),
+    }
+
+
+def memory_start(name):
+    """Mark the start of a memory profiling stage, None when tracemalloc is not tracing"""
+    import tracemalloc
+    global memory_peak
+
+    if not tracemalloc.is_tracing():
+        return None
+
+    memory_peak = max(memory_peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+    return {
+        'name': name,
+        'current': tracemalloc.get_traced_memory()[0],
+        'snapshot': tracemalloc.take_snapshot(),
+        'started': time.perf_counter(),
+    }
+
+
+def memory_stop(marker):
+    """
+    Measure a stage started with memory_start()
+
+    Returns:
+        dict: Peak traced memory during the stage, memory retained by it and the allocation
+        sites which grew most, None when tracemalloc was not tracing
+    """
+    import tracemalloc
+
+    if marker is None or not tracemalloc.is_tracing():
+        return None
+
+    current, peak = tracemalloc.get_traced_memory()
+    seconds = time.perf_counter() - marker['started']
+    own = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, '<frozen *>'))
+    growth = tracemalloc.take_snapshot().filter_traces(own).compare_to(marker['snapshot'].filter_traces(own), 'lineno')
+    # The markers and snapshots of the profiler itself are not sites of the stage
+    profiler = profiler_lines()
+    growth = [stat for stat in growth
+              if (os.path.abspath(stat.traceback[0].filename), stat.traceback[0].lineno) not in profiler]
+
+    return {
+        'stage': marker['name'],
+        'peak_bytes': peak,
+        'retained_bytes': current - marker['current'],
+        'seconds': round(seconds, 3),
+        'top': [{'site': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+                 'bytes': stat.size_diff, 'count': stat.count_diff}
+                for stat in growth[:memory_top_sites] if stat.size_diff > 0],
+    }
+
+
+def profiler_lines():
+    """File and line pairs of the memory profiling functions"""
+    import inspect
+    lines = set()
+
+    for function in (memory_start, memory_stop, memory_stage):
+        source, first = inspect.getsourcelines(function)
+        lines.update((os.path.abspath(__file__), first + number) for number in range(len(source)))
+
+    return lines
+
+
+@contextmanager
+def memory_stage(name):
+    """Add the memory used by the enclosed stage to memory_stages when --memprofile traces allocations"""
+    marker = memory_start(name)
+    try:
+        yield
+    finally:
+        stage = memory_stop(marker)
+        if stage is not None:
+            memory_stages.append(stage)
+
+
+def report_memory():
+    """Write memory_profile.json, add the stages to the run summary and print them in text format"""
+    import tracemalloc
+
+    profile = {'traced_peak_bytes': max(memory_peak, tracemalloc.get_traced_memory()[1]), 'stages': memory_stages}
+    summary['memory'] = profile
+
+    os.makedirs(args.output, exist_ok=True)
+    with open(os.path.join(args.output, 'memory_profile.json'), 'w') as file:
+        json.dump(profile, file, indent=1)
+    summary['files'].append('memory_profile.json')
+
+    if args.format != 'text':
+        return
+
+    from tabulate import tabulate
+    mib = 2 ** 20
+    print(tabulate([[stage['stage'], f"{stage['peak_bytes'] / mib:.1f}", f"{stage['retained_bytes'] / mib:.1f}",
+                     f"{stage['seconds']:g}"] for stage in memory_stages],
+                   headers=['Stage', 'Peak MiB', 'Retained MiB', 'Seconds'], disable_numparse=True))
+    for stage in memory_stages:
+        print(f"\nAllocation sites growing most in {stage['stage']}:")
+        for site in stage['top']:
+            print(f"  {site['bytes'] / 1024:10.1f} KiB {site['count']:8} blocks  {site['site']}")
+
+
+def report_estimate(estimate):
+    if args.format == 'text':
+        print(f"{estimate['repeaters']} repeaters in {estimate['zones']} zones with {estimate['channels']} channels")
+        print(f"{estimate['api_calls']} BrandMeister API calls, {estimate['cached']} answered from the cache")
+        print(f"About {estimate['seconds']:g} seconds")
+    else:
+        print(json.dumps(estimate))
+
+
+def warm_cache():
+    """Refetch talkgroups and talkgroup names of the selected repeaters into the cache and print timings"""
+    timings = {}
+
+    started = time.perf_counter()
+    download_file()
+    timings['download'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    select_repeaters()
+    timings['filter'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    unique_talkgroups = set()
+    failed = 0
+    for item in filtered_list:
+        try:
+            for tg_id, slot in get_talkgroup_channels(item.id, force=True):
+                unique_talkgroups.add(tg_id)
+        except Exception:
+            failed += 1
+    timings['talkgroups'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for tg_id in sorted(unique_talkgroups):
+        try:
+            get_talkgroup_name(tg_id, force=True)
+        except Exception as e:
+            failed += 1
+            print(f"Error fetching name for TG {tg_id}: {e}")
+    timings['names'] = time.perf_counter() - started
+
+    print(json.dumps({
+        'repeaters': len(filtered_list),
+        'talkgroups': len(unique_talkgroups),
+        'requests': api_stats['requests'],
+        'cached': api_stats['cached'],
+        'failed': failed,
+        'seconds': {stage: round(seconds, 3) for stage, seconds in timings.items()},
+    }))
+
+
+def main(argv=None):
+    parse_arguments(argv)
+
+    if args.warm:
+        warm_cache()
+        return
+
+    if args.dry_run:
+        report_estimate(estimate_job())
+        return
+
+    if args.memprofile:
+        import tracemalloc
+        tracemalloc.start()
+
     if args.customize:
         check_custom()
-    download_file()
-    filter_list()
-    process_channels()
-    cleanup_contact_uploads()
\ No newline at end of file
+    with memory_stage('download'):
+        download_file()
+    with memory_stage('filter'):
+        select_repeaters()
+    if args.format == 'jsonl' and exists(os.path.join(args.output, 'run_summary.jsonl')):
+        os.remove(os.path.join(args.output, 'run_summary.jsonl'))
+    with memory_stage('channels'):
+        process_channels()
+    if args.memprofile:
+        report_memory()
+    if args.format in ('json', 'jsonl'):
+        write_summary()
+    # Templates given with --contacts belong to the job, the web app removes them
+    if not args.contacts:
+        cleanup_contact_uploads()
+
+
+if __name__ == '__main__':
+    main()